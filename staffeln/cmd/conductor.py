@@ -6,7 +6,7 @@ import cotyledon
 from cotyledon import oslo_config_glue
 
 import staffeln.conf
-from staffeln.common import service
+from staffeln.common import ratelimit, service
 from staffeln.conductor import manager
 
 CONF = staffeln.conf.CONF
@@ -14,6 +14,8 @@ CONF = staffeln.conf.CONF
 
 def main():
     service.prepare_service()
+    # Share the API rate limit with the forked workers
+    ratelimit.LIMITER.setup_shared()
 
     sm = cotyledon.ServiceManager()
     sm.add(
@@ -26,5 +28,11 @@ def main():
         workers=CONF.conductor.rotation_workers,
         args=(CONF,),
     )
+    if CONF.conductor.backup_notifications_enabled:
+        sm.add(
+            manager.NotificationManager,
+            workers=1,
+            args=(CONF,),
+        )
     oslo_config_glue.setup(sm, CONF)
     sm.run()
@@ -0,0 +1,42 @@
+"""In memory caches"""
+
+from __future__ import annotations
+
+import threading
+import time
+
+
+class TTLCache(object):
+    """Thread safe in memory cache whose entries expire after a TTL"""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        """Return the cached value, or default if missing or expired"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            return value
+
+    def __contains__(self, key):
+        marker = object()
+        return self.get(key, marker) is not marker
+
+    def set(self, key, value, ttl):
+        """Cache a value for ttl seconds"""
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
@@ -6,6 +6,10 @@ BACKUP_COMPLETED = 2
 BACKUP_WIP = 1
 BACKUP_PLANNED = 0
 
+DELETION_FAILED = 0
+DELETION_IN_PROGRESS = 1
+DELETION_DONE = 2
+
 BACKUP_ENABLED_KEY = "true"
 BACKUP_RESULT_CHECK_INTERVAL = 60  # second
 
@@ -13,4 +17,6 @@ BACKUP_RESULT_CHECK_INTERVAL = 60  # second
 DEFAULT_BACKUP_CYCLE_TIMEOUT = "5min"
 
 PULLER = "puller"
+REPORTER = "reporter"
+BACKUP_WORKERS = "backup-workers"
 RETENTION = "retention"
@@ -5,12 +5,14 @@ import glob
 import os
 import re
 import sys
+import threading
+import time
 import uuid
 from typing import Optional  # noqa: H301
 
 import sherlock
 from oslo_log import log
-from tooz import coordination
+from tooz import coordination, partitioner
 
 from staffeln import conf, exception
 
@@ -26,10 +28,16 @@ class LockManager(object):
         self.coordinator = COORDINATOR if backend_url else K8SCOORDINATOR
 
     def __enter__(self):
-        self.coordinator.start()
+        # The coordinator stays connected between uses, entering only
+        # makes sure the connection is alive.
+        self.coordinator.ensure_started()
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    def terminate(self):
+        """Disconnect the coordinator when the service stops"""
         self.coordinator.stop()
 
 
@@ -70,12 +78,19 @@ class Coordinator(object):
         meaningful prefix.
     """
 
+    supports_partitioning = True
+
     def __init__(self, agent_id: Optional[str] = None, prefix: str = ""):
         self.coordinator = None
         self.agent_id = agent_id or str(uuid.uuid4())
+        self._generated_agent_id = agent_id is None
         self.started = False
         self.prefix = prefix
         self._file_path = None
+        self._groups = set()
+        self._partitioners = {}
+        self._last_health_check = None
+        self._start_lock = threading.RLock()
 
     def _get_file_path(self, backend_url):
         if backend_url.startswith("file://"):
@@ -87,26 +102,88 @@ class Coordinator(object):
         return None
 
     def start(self) -> None:
-        if self.started:
-            return
+        with self._start_lock:
+            if self.started:
+                return
 
-        backend_url = CONF.coordination.backend_url
+            backend_url = CONF.coordination.backend_url
 
-        # member_id should be bytes
-        member_id = (self.prefix + self.agent_id).encode("ascii")
-        self.coordinator = coordination.get_coordinator(backend_url, member_id)
-        assert self.coordinator is not None
-        self.coordinator.start(start_heart=True)
-        self._file_path = self._get_file_path(backend_url)
-        self.started = True
+            # member_id should be bytes
+            member_id = (self.prefix + self.agent_id).encode("ascii")
+            self.coordinator = coordination.get_coordinator(backend_url, member_id)
+            assert self.coordinator is not None
+            self.coordinator.start(start_heart=True)
+            self._file_path = self._get_file_path(backend_url)
+            self._last_health_check = time.monotonic()
+            self.started = True
 
     def stop(self) -> None:
         """Disconnect from coordination backend and stop heartbeat."""
-        if self.started:
-            if self.coordinator is not None:
-                self.coordinator.stop()
-            self.coordinator = None
-            self.started = False
+        with self._start_lock:
+            if self.started:
+                if self.coordinator is not None:
+                    try:
+                        self.coordinator.stop()
+                    except coordination.ToozError as ex:
+                        LOG.warning(f"Failed to stop coordinator: {ex}")
+                self.coordinator = None
+                self.started = False
+
+    def _after_fork(self) -> None:
+        """Become a distinct coordination member in a forked process.
+
+        Worker processes are forked after the coordinator is created, so a
+        generated agent id is renewed in each of them. The connection of
+        the parent process is dropped without stopping it, as it still
+        belongs to the parent.
+        """
+        if self._generated_agent_id:
+            self.agent_id = str(uuid.uuid4())
+        self._start_lock = threading.RLock()
+        self.coordinator = None
+        self.started = False
+        self._groups = set()
+        self._partitioners = {}
+        self._last_health_check = None
+
+    def ensure_started(self) -> None:
+        """Start the coordinator, or reconnect it if found unhealthy.
+
+        The health of a started coordinator is checked at most once per
+        `CONF.coordination.health_check_interval` seconds. Groups joined
+        before a reconnection are joined again.
+        """
+        with self._start_lock:
+            if not self.started:
+                self.start()
+                return
+            now = time.monotonic()
+            if (
+                self._last_health_check is not None
+                and now - self._last_health_check
+                < CONF.coordination.health_check_interval
+            ):
+                return
+            self._last_health_check = now
+            if self._is_healthy():
+                return
+            LOG.warning("Coordination backend connection lost, reconnecting.")
+            self.stop()
+            self.start()
+            for group_id in list(self._groups):
+                self.join_group(group_id)
+            for group_id in list(self._partitioners):
+                self.join_partitioned_group(group_id)
+
+    def _is_healthy(self) -> bool:
+        if self.coordinator is None or not self.coordinator.is_started:
+            return False
+        try:
+            self.coordinator.heartbeat()
+        except coordination.ToozError as ex:
+            LOG.debug(f"Coordinator heartbeat failed: {ex}")
+            return False
+        return True
 
     def get_lock(self, name: str):
         """Return a Tooz backend lock.
@@ -121,6 +198,74 @@ class Coordinator(object):
         else:
             raise exception.LockCreationFailed("Coordinator uninitialized.")
 
+    def join_group(self, group_id: str) -> None:
+        """Join the coordination group, creating it if needed.
+
+        :param str group_id: The group name that is used to identify it
+            across all nodes.
+        """
+        if self.coordinator is None:
+            raise exception.LockCreationFailed("Coordinator uninitialized.")
+        group = (self.prefix + group_id).encode("ascii")
+        try:
+            self.coordinator.create_group(group).get()
+        except coordination.GroupAlreadyExist:
+            pass
+        try:
+            self.coordinator.join_group(group).get()
+        except coordination.MemberAlreadyExist:
+            pass
+        self._groups.add(group_id)
+
+    def join_partitioned_group(self, group_id: str) -> None:
+        """Join the coordination group and partition objects among members.
+
+        Objects are assigned to the live members of the group with a
+        consistent hash ring, which is updated by `run_watchers` when
+        members join or leave.
+
+        :param str group_id: The group name that is used to identify it
+            across all nodes.
+        """
+        if self.coordinator is None:
+            raise exception.LockCreationFailed("Coordinator uninitialized.")
+        group = (self.prefix + group_id).encode("ascii")
+        try:
+            group_partitioner = self.coordinator.join_partitioned_group(group)
+        except coordination.MemberAlreadyExist:
+            group_partitioner = partitioner.Partitioner(self.coordinator, group)
+        self._partitioners[group_id] = group_partitioner
+
+    def belongs_to_self(self, group_id: str, obj) -> bool:
+        """Return whether this member is responsible for the object.
+
+        Every object belongs to this member when the partitioned group was
+        not joined.
+
+        :param str group_id: The partitioned group name.
+        :param obj: The object to check.
+        """
+        group_partitioner = self._partitioners.get(group_id)
+        if group_partitioner is None:
+            return True
+        return group_partitioner.belongs_to_self(obj)
+
+    def run_watchers(self) -> None:
+        """Apply the membership changes of the watched groups."""
+        if self.coordinator is not None:
+            self.coordinator.run_watchers()
+
+    def get_members(self, group_id: str) -> set:
+        """Return the members of the coordination group.
+
+        :param str group_id: The group name that is used to identify it
+            across all nodes.
+        """
+        if self.coordinator is None:
+            raise exception.LockCreationFailed("Coordinator uninitialized.")
+        group = (self.prefix + group_id).encode("ascii")
+        return self.coordinator.get_members(group).get()
+
     def remove_lock(self, glob_name):
         # Most locks clean up on release, but not the file lock, so we manually
         # clean them.
@@ -148,6 +293,8 @@ class K8sCoordinator(object):
     :param str namespace: Set lock namespace.
     """
 
+    supports_partitioning = False
+
     def __init__(
         self,
         expire: int = 3600,
@@ -166,6 +313,9 @@ class K8sCoordinator(object):
         sherlock.configure(expire=self.expire, timeout=self.timeout)
         self.started = True
 
+    def ensure_started(self) -> None:
+        self.start()
+
     def stop(self) -> None:
         """Disconnect from coordination backend and stop heartbeat."""
         pass
@@ -184,3 +334,4 @@ class K8sCoordinator(object):
 
 COORDINATOR = Coordinator(prefix="staffeln-")
 K8SCOORDINATOR = K8sCoordinator()
+os.register_at_fork(after_in_child=COORDINATOR._after_fork)
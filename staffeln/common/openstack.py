@@ -1,31 +1,135 @@
 from __future__ import annotations
 
+import collections
+import threading
+
+import futurist
 from openstack import exceptions, proxy
 from oslo_log import log
 
-from staffeln.common import auth
+import staffeln.conf
+from staffeln.common import auth, cache, ratelimit
 from staffeln.i18n import _
 
+CONF = staffeln.conf.CONF
 LOG = log.getLogger(__name__)
 
 
+class ConnectionCache(object):
+    """Process wide LRU cache of project scoped connections
+
+    Connections outlive the OpenstackSDK instances, so that project
+    tokens and HTTP sessions are reused across cycles. A connection is
+    evicted when its token is about to expire, or when the cache is full
+    and it is the least recently used one.
+    """
+
+    def __init__(self):
+        self._conns = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._conns)
+
+    def __contains__(self, project_id):
+        return project_id in self._conns
+
+    def get(self, project_id, connect):
+        """Get the connection of a project, creating it if needed
+
+        :param project_id: The project id.
+        :param connect: Callable creating a new connection for the project.
+        :returns: the project scoped connection.
+        """
+        evicted = []
+        with self._lock:
+            conn = self._conns.pop(project_id, None)
+            if conn is not None and self._will_expire_soon(conn):
+                LOG.debug(f"Token of project {project_id} expires soon.")
+                evicted.append(conn)
+                conn = None
+            if conn is None:
+                conn = connect()
+            self._conns[project_id] = conn
+            while len(self._conns) > CONF.openstack.connection_cache_size:
+                _project_id, old_conn = self._conns.popitem(last=False)
+                evicted.append(old_conn)
+        for old_conn in evicted:
+            self._close(old_conn)
+        return conn
+
+    def clear(self):
+        with self._lock:
+            conns = list(self._conns.values())
+            self._conns.clear()
+        for conn in conns:
+            self._close(conn)
+
+    @staticmethod
+    def _will_expire_soon(conn):
+        auth_ref = getattr(conn.session.auth, "auth_ref", None)
+        if auth_ref is None:
+            # Not authenticated yet
+            return False
+        return auth_ref.will_expire_soon(CONF.openstack.connection_token_stale_duration)
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception as ex:  # pylint: disable=W0703
+            LOG.debug(f"Failed to close connection. {str(ex)}")
+
+
+CONNECTIONS = ConnectionCache()
+# user id -> email, None if the user has no email or does not exist
+USER_EMAILS = cache.TTLCache()
+# project id -> ids of the users with a role in the project
+PROJECT_MEMBERS = cache.TTLCache()
+# (project id, usage) -> volume quotas of the project
+VOLUME_QUOTAS = cache.TTLCache()
+
+
 class OpenstackSDK:
     def __init__(self):
-        self.conn_list = {}
-        self.conn = auth.create_connection()
+        self.admin_conn = auth.create_connection()
+        # The project scope is kept per thread, so that workers of a
+        # thread pool can act on different projects at the same time.
+        self._local = threading.local()
+
+    def refresh(self):
+        """Renew the admin connection in place
+
+        The instance is shared by threads which may be using their project
+        connections at the same time, so their scope is kept.
+        """
+        self.admin_conn = auth.create_connection()
+
+    @property
+    def conn(self):
+        return getattr(self._local, "conn", self.admin_conn)
+
+    @conn.setter
+    def conn(self, conn):
+        self._local.conn = conn
 
     def set_project(self, project):
         LOG.debug(_("Connect as project %s" % project.get("name")))
         project_id = project.get("id")
 
-        if project_id not in self.conn_list:
+        def connect():
             LOG.debug(_("Initiate connection for project %s" % project.get("name")))
-            conn = self.conn.connect_as_project(project)
-            self.conn_list[project_id] = conn
-        LOG.debug(_("Connect as project %s" % project.get("name")))
-        self.conn = self.conn_list[project_id]
+            return self.admin_conn.connect_as_project(project)
+
+        self.conn = CONNECTIONS.get(project_id, connect)
+
+    @property
+    def admin_scope(self):
+        """Whether backups are managed with the admin connection"""
+        return CONF.openstack.admin_scope_backups
 
     # user
+    @ratelimit.rate_limited("identity")
     def get_user_id(self):
         user_name = self.conn.config.auth["username"]
         if "user_domain_id" in self.conn.config.auth:
@@ -38,53 +142,131 @@ class OpenstackSDK:
             user = self.conn.get_user(name_or_id=user_name)
         return user.id
 
+    @ratelimit.rate_limited("identity")
     def get_role_assignments(self, project_id, user_id=None):
         filters = {"project": project_id}
         if user_id:
             filters["user"] = user_id
         return self.conn.list_role_assignments(filters=filters)
 
+    @ratelimit.rate_limited("identity")
     def get_user(self, user_id):
         return self.conn.get_user(name_or_id=user_id)
 
-    def get_project_member_emails(self, project_id):
-        members = self.get_role_assignments(project_id)
-        emails = []
-        for member in members:
+    @ratelimit.rate_limited("identity", paginated=True)
+    def get_users(self):
+        return self.conn.identity.users()
+
+    def prefetch_user_emails(self):
+        """Cache the emails of all users with a single listing"""
+        ttl = CONF.openstack.identity_cache_ttl
+        for user in self.get_users():
+            USER_EMAILS.set(user.id, getattr(user, "email", None) or None, ttl)
+
+    def get_project_member_ids(self, project_id):
+        members = PROJECT_MEMBERS.get(project_id)
+        if members is not None:
+            return members
+        members = []
+        for member in self.get_role_assignments(project_id):
             if hasattr(member, "user"):
                 user_id = None
                 if type(member.user) is dict and "id" in member.user:
                     user_id = member.user["id"]
                 elif type(member.user) is str:
                     user_id = member.user
-                if user_id:
-                    user = self.get_user(user_id)
-                    if user and hasattr(user, "email") and user.email:
-                        emails.append(user.email)
+                if user_id and user_id not in members:
+                    members.append(user_id)
+        PROJECT_MEMBERS.set(project_id, members, CONF.openstack.identity_cache_ttl)
+        return members
+
+    def get_user_email(self, user_id):
+        marker = object()
+        email = USER_EMAILS.get(user_id, marker)
+        if email is not marker:
+            return email
+        user = self.get_user(user_id)
+        email = None
+        if user and hasattr(user, "email") and user.email:
+            email = user.email
+        USER_EMAILS.set(user_id, email, CONF.openstack.identity_cache_ttl)
+        return email
+
+    def get_project_member_emails(self, project_id):
+        emails = []
+        for user_id in self.get_project_member_ids(project_id):
+            email = self.get_user_email(user_id)
+            if email:
+                emails.append(email)
         return emails
 
+    @ratelimit.rate_limited("identity")
     def get_projects(self):
         return self.conn.list_projects()
 
+    @ratelimit.rate_limited("compute", paginated=True)
     def get_servers(self, project_id=None, all_projects=True, details=True):
+        limit = CONF.openstack.list_page_size
         if project_id is not None:
             return self.conn.compute.servers(
                 details=details,
                 all_projects=all_projects,
                 project_id=project_id,
+                limit=limit,
             )
         else:
-            return self.conn.compute.servers(details=details, all_projects=all_projects)
+            return self.conn.compute.servers(
+                details=details, all_projects=all_projects, limit=limit
+            )
 
+    @ratelimit.rate_limited("block_storage")
     def get_volume(self, uuid, project_id):
         return self.conn.get_volume_by_id(uuid)
 
+    @ratelimit.rate_limited("block_storage", paginated=True)
+    def get_volumes(self, project_id=None, all_projects=True, details=True):
+        limit = CONF.openstack.list_page_size
+        if project_id is not None:
+            return self.conn.block_storage.volumes(
+                details=details,
+                all_projects=all_projects,
+                project_id=project_id,
+                limit=limit,
+            )
+        else:
+            return self.conn.block_storage.volumes(
+                details=details, all_projects=all_projects, limit=limit
+            )
+
+    @ratelimit.rate_limited("block_storage", paginated=True)
+    def get_backups(
+        self, project_id=None, all_projects=False, details=True, status=None
+    ):
+        query = {"limit": CONF.openstack.list_page_size}
+        if status is not None:
+            query["status"] = status
+        if project_id is not None:
+            query["project_id"] = project_id
+        if self.admin_scope:
+            return self.admin_conn.block_storage.backups(
+                details=details,
+                all_projects=all_projects or project_id is not None,
+                **query,
+            )
+        return self.conn.block_storage.backups(
+            details=details, all_projects=all_projects, **query
+        )
+
+    @ratelimit.rate_limited("block_storage")
     def get_backup(self, uuid, project_id=None):
         try:
+            if self.admin_scope:
+                return self.admin_conn.block_storage.get_backup(uuid)
             return self.conn.get_volume_backup(uuid)
         except exceptions.ResourceNotFound:
             return None
 
+    @ratelimit.rate_limited("block_storage")
     def create_backup(
         self,
         volume_id,
@@ -102,6 +284,7 @@ class OpenstackSDK:
             incremental=incremental,
         )
 
+    @ratelimit.rate_limited("block_storage")
     def delete_backup(self, uuid, project_id=None, force=False):
         # Note(Alex): v3 is not supporting force delete?
         # conn.block_storage.delete_backup(
@@ -109,6 +292,11 @@ class OpenstackSDK:
         # )
         LOG.debug(f"Start deleting backup {uuid} in OpenStack.")
         try:
+            if self.admin_scope:
+                self.admin_conn.block_storage.delete_backup(
+                    uuid, ignore_missing=False, force=force
+                )
+                return
             self.conn.delete_volume_backup(uuid, force=force)
             # TODO(Alex): After delete the backup generator,
             # need to set the volume status again
@@ -125,19 +313,51 @@ class OpenstackSDK:
         quota = self._get_volume_quotas(project_id)
         return quota.backup_gigabytes
 
-    # rewrite openstasdk._block_storage.get_volume_quotas
-    # added usage flag
-    # ref: https://docs.openstack.org/api-ref/block-storage/v3/?
-    # expanded=#show-quota-usage-for-a-project
+    def get_quotas(self, project_ids, usage=True):
+        """Get the volume quotas of projects concurrently
+
+        :param project_ids: the ids of the projects
+        :param usage: whether to include the quota usage
+        :returns: quotas mapped by project id, projects whose quotas
+                  could not be fetched are left out
+        """
+        quotas = {}
+        with futurist.ThreadPoolExecutor(
+            max_workers=CONF.openstack.quota_workers
+        ) as executor:
+            futures = {
+                project_id: executor.submit(self._get_volume_quotas, project_id, usage)
+                for project_id in set(project_ids)
+            }
+        for project_id, future in futures.items():
+            try:
+                quotas[project_id] = future.result()
+            except Exception as ex:  # pylint: disable=W0703
+                LOG.warn(f"Failed to get quotas of project {project_id}. {str(ex)}")
+        return quotas
+
     def _get_volume_quotas(self, project_id, usage=True):
-        """Get volume quotas for a project
+        """Get volume quotas for a project, cached for quota_cache_ttl
 
         :param name_or_id: project name or id
         :raises: OpenStackCloudException if it's not a valid project
 
         :returns: Munch object with the quotas
         """
+        quota = VOLUME_QUOTAS.get((project_id, usage))
+        if quota is None:
+            quota = self._fetch_volume_quotas(project_id, usage=usage)
+            VOLUME_QUOTAS.set(
+                (project_id, usage), quota, CONF.openstack.quota_cache_ttl
+            )
+        return quota
 
+    # rewrite openstasdk._block_storage.get_volume_quotas
+    # added usage flag
+    # ref: https://docs.openstack.org/api-ref/block-storage/v3/?
+    # expanded=#show-quota-usage-for-a-project
+    @ratelimit.rate_limited("block_storage")
+    def _fetch_volume_quotas(self, project_id, usage=True):
         if usage:
             resp = self.conn.block_storage.get(
                 "/os-quota-sets/{project_id}?usage=True".format(project_id=project_id)
@@ -0,0 +1,170 @@
+"""Rate limiting of the OpenStack API calls"""
+
+from __future__ import annotations
+
+import functools
+import multiprocessing
+import threading
+import time
+
+from oslo_log import log
+
+from staffeln import conf
+from staffeln.common import lock
+
+CONF = conf.CONF
+LOG = log.getLogger(__name__)
+
+SERVICES = ("compute", "block_storage", "identity")
+# Coordination group joined by every process issuing API calls
+GROUP = "api-rate-limit"
+# Seconds between two refreshes of the coordination group members
+MEMBERS_REFRESH_INTERVAL = 30
+
+
+class TokenBucket(object):
+    """Token bucket, optionally kept in memory shared between processes
+
+    A shared bucket must be created before the worker processes are
+    forked, so that all of them consume the same tokens.
+    """
+
+    def __init__(self, shared=False):
+        if shared:
+            self._state = multiprocessing.RawArray("d", 2)
+            self._lock = multiprocessing.Lock()
+        else:
+            self._state = [0.0, 0.0]
+            self._lock = threading.Lock()
+        # The bucket starts full
+        self._state[1] = -1.0
+
+    def consume(self, rate, burst):
+        """Take one token from the bucket
+
+        :param rate: The tokens added to the bucket per second.
+        :param burst: The capacity of the bucket.
+        :returns: 0 if a token was taken, otherwise the seconds to wait
+                  until a token is available.
+        """
+        with self._lock:
+            # CLOCK_MONOTONIC is shared by all processes of the host
+            now = time.monotonic()
+            tokens, updated = self._state
+            if updated < 0:
+                tokens = burst
+            else:
+                tokens = min(burst, tokens + (now - updated) * rate)
+            self._state[1] = now
+            if tokens >= 1:
+                self._state[0] = tokens - 1
+                return 0
+            self._state[0] = tokens
+            return (1 - tokens) / rate
+
+
+class RateLimiter(object):
+    """Limit the rate of the API calls per OpenStack service
+
+    With a tooz coordination backend, every process joins a coordination
+    group and gets an equal share of the configured rate. Otherwise the
+    processes of the host share the buckets created by setup_shared(), or
+    keep their own buckets if it was not called before forking.
+    """
+
+    def __init__(self):
+        self.local_buckets = {service: TokenBucket() for service in SERVICES}
+        self.shared_buckets = None
+        self.members = 0
+        self._members_checked = None
+        self._members_lock = threading.Lock()
+
+    def setup_shared(self):
+        """Create the buckets shared with the processes forked afterwards"""
+        self.shared_buckets = {
+            service: TokenBucket(shared=True) for service in SERVICES
+        }
+
+    def _coordinated_members(self):
+        """Return the number of coordinated processes, or 0 if unavailable"""
+        coordinator = lock.COORDINATOR
+        if not CONF.coordination.backend_url or not coordinator.started:
+            return 0
+        with self._members_lock:
+            now = time.monotonic()
+            if (
+                self._members_checked is None
+                or now - self._members_checked >= MEMBERS_REFRESH_INTERVAL
+            ):
+                self._members_checked = now
+                try:
+                    coordinator.join_group(GROUP)
+                    self.members = len(coordinator.get_members(GROUP))
+                except Exception as ex:  # pylint: disable=W0703
+                    LOG.debug(f"Failed to get rate limit group members. {str(ex)}")
+                    self.members = 0
+            return self.members
+
+    def acquire(self, service):
+        """Block until a call to the service is allowed"""
+        rate = getattr(CONF.openstack, f"{service}_rate_limit")
+        if rate <= 0:
+            return
+        burst = CONF.openstack.rate_limit_burst
+        members = self._coordinated_members()
+        if members:
+            rate = rate / members
+            burst = max(1.0, burst / members)
+            bucket = self.local_buckets[service]
+        elif self.shared_buckets is not None:
+            bucket = self.shared_buckets[service]
+        else:
+            bucket = self.local_buckets[service]
+        while True:
+            wait = bucket.consume(rate, burst)
+            if not wait:
+                return
+            time.sleep(wait)
+
+
+LIMITER = RateLimiter()
+
+
+def limit_pages(service, listing):
+    """Iterate a lazy listing, waiting for the rate limit before each page
+
+    Pages are assumed to hold CONF.openstack.list_page_size resources.
+    """
+    page_size = CONF.openstack.list_page_size
+    iterator = iter(listing)
+    count = 0
+    while True:
+        if count % page_size == 0:
+            LIMITER.acquire(service)
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        count += 1
+        yield item
+
+
+def rate_limited(service, paginated=False):
+    """Decorator to rate limit the calls to an OpenStack service
+
+    With `paginated`, the decorated function returns a lazy listing whose
+    pages are requested while it is iterated, and each page is limited
+    instead of the call.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if paginated:
+                return limit_pages(service, func(*args, **kwargs))
+            LIMITER.acquire(service)
+            return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
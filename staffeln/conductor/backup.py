@@ -3,6 +3,8 @@ from __future__ import annotations
 import collections
 from datetime import timedelta, timezone
 
+import futurist
+from futurist import waiters
 from openstack.exceptions import HttpException as OpenstackHttpException
 from openstack.exceptions import ResourceNotFound as OpenstackResourceNotFound
 from openstack.exceptions import SDKException as OpenstackSDKException
@@ -44,6 +46,19 @@ QueueMapping = collections.namedtuple(
         "volume_name",
         "incremental",
         "reason",
+        "volume_size",
+        "availability_zone",
+    ],
+)
+
+VolumeMapping = collections.namedtuple(
+    "VolumeMapping",
+    [
+        "volume_id",
+        "status",
+        "name",
+        "size",
+        "availability_zone",
     ],
 )
 
@@ -57,6 +72,7 @@ def retry_auth(func):
         except OpenstackHttpException as ex:
             if ex.status_code == 403:
                 LOG.warn(_("Token has been expired or rotated!"))
+                openstack.CONNECTIONS.clear()
                 self.refresh_openstacksdk()
                 return func(self, *args, **kwargs)
 
@@ -68,15 +84,46 @@ class Backup(object):
 
     def __init__(self):
         self.ctx = context.make_context()
-        self.refresh_openstacksdk()
+        self.openstacksdk = openstack.OpenstackSDK()
         self.result = result.BackupResult(self)
         self.project_list = {}
+        self.volume_index = {}
+        # Observed backup throughput in MiB per second, for full and
+        # incremental backups.
+        self.backup_throughput = {
+            False: float(CONF.conductor.backup_throughput),
+            True: float(CONF.conductor.backup_throughput),
+        }
 
     def refresh_openstacksdk(self):
-        self.openstacksdk = openstack.OpenstackSDK()
+        # The backup stages share this controller from several threads,
+        # replacing the SDK instance would drop their project scope.
+        self.openstacksdk.refresh()
 
     def publish_backup_result(self, purge_on_success=False):
-        for project_id, project_name in self.result.project_list:
+        """Report the finished backup tasks of each project
+
+        The projects to report are read from the queue, so reports do not
+        depend on a discovery run by the same worker.
+        """
+        project_ids = self.get_queue_project_ids(
+            constants.BACKUP_COMPLETED
+        ) | self.get_queue_project_ids(constants.BACKUP_FAILED)
+        if not project_ids:
+            return
+        self.update_project_list(project_ids)
+        self.prefetch_report_receivers(len(project_ids))
+        # Warm the quota cache used by the reports
+        self.openstacksdk.get_quotas(sorted(project_ids))
+        for project_id in sorted(project_ids):
+            if project_id not in self.project_list:
+                LOG.info(
+                    f"Project {project_id} is not existing anymore, purge "
+                    "its backup tasks without reporting."
+                )
+                self.purge_backups(project_id)
+                continue
+            project_name = self.project_list[project_id].get("name")
             try:
                 publish_result = self.result.publish(project_id, project_name)
                 if publish_result and purge_on_success:
@@ -89,14 +136,54 @@ class Backup(object):
                     f"{str(ex)}"
                 )
 
-    def refresh_backup_result(self):
-        self.result.initialize()
+    def prefetch_report_receivers(self, project_count):
+        """Fetch all user emails at once when reporting to many projects"""
+        threshold = CONF.notification.member_email_prefetch_threshold
+        if (
+            not threshold
+            or project_count < threshold
+            or not CONF.notification.sender_email
+            or CONF.notification.receiver
+            or CONF.notification.project_receiver_domain
+        ):
+            # Reports are not sent to project members
+            return
+        try:
+            self.openstacksdk.prefetch_user_emails()
+        except Exception as ex:  # pylint: disable=W0703
+            LOG.warn(f"Failed to prefetch user emails. {str(ex)}")
 
     def get_backups(self, filters=None, **kwargs):
         return objects.Volume.list(  # pylint: disable=E1120
             context=self.ctx, filters=filters, **kwargs
         )
 
+    def get_volumes_backups(self, volume_ids):
+        """Get all the backups of a set of volumes"""
+        return objects.Volume.list_by_volumes(  # pylint: disable=E1120
+            context=self.ctx, volume_ids=volume_ids
+        )
+
+    def get_expired_backups(self, default_cutoff=None, instance_cutoffs=None):
+        """Yield the expired backups, fetched page by page
+
+        :param default_cutoff: cutoff of the instances without their own.
+        :param instance_cutoffs: dict mapping instance_id to its cutoff.
+        """
+        marker = None
+        while True:
+            backups = objects.Volume.list_expired(  # pylint: disable=E1120
+                context=self.ctx,
+                default_cutoff=default_cutoff,
+                instance_cutoffs=instance_cutoffs,
+                limit=CONF.conductor.retention_page_size,
+                marker=marker,
+            )
+            yield from backups
+            if len(backups) < CONF.conductor.retention_page_size:
+                return
+            marker = backups[-1]
+
     def get_backup_quota(self, project_id):
         return self.openstacksdk.get_backup_quota(project_id)
 
@@ -117,6 +204,28 @@ class Backup(object):
         )
         return queue
 
+    def get_queue_task_by_backup_id(self, backup_id):
+        """Get single volume queue task by its backup id"""
+        return objects.Queue.get_by_backup_id(  # pylint: disable=E1120
+            context=self.ctx, backup_id=backup_id
+        )
+
+    def claim_queue_tasks(self, backup_status, limit, worker_id, project_ids=None):
+        """Claim a batch of volume queue tasks for this worker"""
+        return objects.Queue.claim(  # pylint: disable=E1120
+            context=self.ctx,
+            backup_status=backup_status,
+            limit=limit,
+            worker_id=worker_id,
+            project_ids=project_ids,
+        )
+
+    def get_queue_project_ids(self, backup_status):
+        """Get the projects having volume queue tasks in a status"""
+        return objects.Queue.list_project_ids(  # pylint: disable=E1120
+            context=self.ctx, backup_status=backup_status
+        )
+
     def create_queue(self, old_tasks):
         """Create the queue of all the volumes for backup
 
@@ -127,16 +236,25 @@ class Backup(object):
         LOG.info("Adding new backup tasks to queue.")
         # 1. get the old task list, not finished in the last cycle
         #  and keep till now
-        old_task_volume_list = []
+        old_task_volume_list = set()
         for old_task in old_tasks:
-            old_task_volume_list.append(old_task.volume_id)
+            old_task_volume_list.add(old_task.volume_id)
 
         # 2. add new tasks in the queue which are not existing in the old task
-        # list
-        task_list = self.check_instance_volumes()
-        for task in task_list:
-            if task.volume_id not in old_task_volume_list:
-                self._volume_queue(task)
+        # list. Tasks are written in batches while discovery goes on.
+        batch_size = CONF.conductor.queue_write_batch_size
+        new_tasks = []
+        count = 0
+        for task in self.check_instance_volumes():
+            if task.volume_id in old_task_volume_list:
+                continue
+            new_tasks.append(task)
+            if len(new_tasks) >= batch_size:
+                count += self._volume_queue(new_tasks)
+                new_tasks = []
+        if new_tasks:
+            count += self._volume_queue(new_tasks)
+        LOG.info(f"Added {count} new backup tasks to queue.")
 
     # Backup the volumes attached to which has a specific metadata
     def filter_by_server_metadata(self, metadata):
@@ -151,17 +269,62 @@ class Backup(object):
         else:
             return True
 
+    def refresh_volume_index(self):
+        """Build the volume index used by discovery
+
+        List volumes of all projects in one paginated sweep and keep the
+        status, name and size of each volume in memory, so that discovery
+        does not need one Cinder call per attached volume. If the listing
+        fails, the index stays empty and lookups fall back to single GETs.
+        """
+        self.volume_index = {}
+        try:
+            volumes = self.openstacksdk.get_volumes(all_projects=True)
+            for volume in volumes:
+                self.volume_index[volume.id] = VolumeMapping(
+                    volume_id=volume.id,
+                    status=volume.status,
+                    name=volume.name,
+                    size=volume.size,
+                    availability_zone=volume.availability_zone,
+                )
+        except OpenstackSDKException as ex:
+            self.volume_index = {}
+            LOG.warn(
+                "Failed to list volumes for all projects, fall back to "
+                f"get volumes one by one. {str(ex)}"
+            )
+        LOG.debug(f"Volume index refreshed with {len(self.volume_index)} volumes.")
+
+    def get_indexed_volume(self, volume_id, project_id):
+        """Get the volume summary from the index or from Cinder on miss"""
+        volume = self.volume_index.get(volume_id)
+        if volume is not None:
+            return volume
+        volume = self.openstacksdk.get_volume(volume_id, project_id)
+        if volume is None:
+            return None
+        volume = VolumeMapping(
+            volume_id=volume_id,
+            status=volume["status"],
+            name=volume["name"],
+            size=volume["size"],
+            availability_zone=volume.get("availability_zone"),
+        )
+        self.volume_index[volume_id] = volume
+        return volume
+
     # Backup the volumes in in-use and available status
     def filter_by_volume_status(self, volume_id, project_id):
         try:
-            volume = self.openstacksdk.get_volume(volume_id, project_id)
+            volume = self.get_indexed_volume(volume_id, project_id)
             if volume is None:
                 return False
-            res = volume["status"] in ("available", "in-use")
+            res = volume.status in ("available", "in-use")
             if not res:
                 reason = _(
                     "Volume %s is not triger new backup task because "
-                    "it is in %s status" % (volume_id, volume["status"])
+                    "it is in %s status" % (volume_id, volume.status)
                 )
                 LOG.info(reason)
                 return reason
@@ -172,26 +335,16 @@ class Backup(object):
 
     def purge_backups(self, project_id=None):
         LOG.info(f"Start pruge backup tasks for project {project_id}")
-        # We can consider make all these in a single DB command
-        success_tasks = self.get_queues(
-            filters={
-                "backup_status": constants.BACKUP_COMPLETED,
-                "project_id": project_id,
-            }
-        )
-        failed_tasks = self.get_queues(
-            filters={
-                "backup_status": constants.BACKUP_FAILED,
-                "project_id": project_id,
-            }
+        count = objects.Queue.purge(  # pylint: disable=E1120
+            context=self.ctx,
+            project_id=project_id,
+            backup_statuses=[
+                constants.BACKUP_COMPLETED,
+                constants.BACKUP_FAILED,
+            ],
         )
-        LOG.debug(f"Start purge completed tasks for project {project_id}")
-        for queue in success_tasks:
-            queue.delete_queue()
-
-        LOG.debug(f"Start purge failed tasks for project {project_id}")
-        for queue in failed_tasks:
-            queue.delete_queue()
+        LOG.debug(f"Purged {count} completed and failed tasks for project {project_id}")
+        return count
 
     def create_failed_backup_obj(self, task):
         # Create backup object for failed backups, to make sure we
@@ -224,7 +377,7 @@ class Backup(object):
 
             if project_id not in self.project_list:
                 self.process_non_existing_backup(task)
-            self.openstacksdk.set_project(self.project_list[project_id])
+            self.set_backup_scope(project_id)
             backup = self.openstacksdk.get_backup(task.backup_id)
             if backup is None:
                 return task.delete_queue()
@@ -281,23 +434,27 @@ class Backup(object):
             # backup_object.delete_backup()
             return False
 
-    #  delete all backups forcily regardless of the status
-    def hard_remove_volume_backup(self, backup_object, skip_inc_err=False):
-        try:
-            project_id = backup_object.project_id
-            if project_id not in self.project_list:
-                LOG.warn(
-                    f"Project {project_id} for backup "
-                    f"{backup_object.backup_id} is not existing in "
-                    "Openstack. Please check your access right to this "
-                    "project. "
-                    "Skip this backup from remove now and will retry later."
-                )
-                # Don't remove backup object, keep it and retry on next
-                # periodic task backup_object.delete_backup()
-                return
+    def request_backup_deletion(self, backup_object):
+        """Request the deletion of a backup from Cinder
 
-            self.openstacksdk.set_project(self.project_list[project_id])
+        The request time is recorded with the backup, so that the deletion
+        is tracked across rotation cycles until Cinder reports the backup
+        gone.
+
+        :returns: the deletion state of the backup
+        """
+        project_id = backup_object.project_id
+        if project_id not in self.project_list:
+            LOG.warn(
+                f"Project {project_id} for backup "
+                f"{backup_object.backup_id} is not existing in "
+                "Openstack. Please check your access right to this "
+                "project. "
+                "Skip this backup from remove now and will retry later."
+            )
+            return constants.DELETION_FAILED
+        try:
+            self.set_backup_scope(project_id)
             backup = self.openstacksdk.get_backup(
                 uuid=backup_object.backup_id, project_id=project_id
             )
@@ -307,30 +464,91 @@ class Backup(object):
                     "Openstack or cinder-backup is not existing in the "
                     "cloud. Start removing backup object from Staffeln."
                 )
-                return backup_object.delete_backup()
-
+                backup_object.delete_backup()
+                return constants.DELETION_DONE
             self.openstacksdk.delete_backup(uuid=backup_object.backup_id)
-            # Don't remove backup until it's officially removed from Cinder
-            # backup_object.delete_backup()
-        except Exception as e:
-            if skip_inc_err and ("Incremental backups exist for this backup" in str(e)):
-                LOG.debug(str(e))
-            else:
-                LOG.info(
-                    f"Backup {backup_object.backup_id} deletion failed. "
-                    "Skip this backup from remove now and will retry later."
+        except Exception as e:  # pylint: disable=W0703
+            LOG.info(
+                f"Backup {backup_object.backup_id} deletion failed. "
+                "Skip this backup from remove now and will retry later."
+            )
+            LOG.debug(f"deletion failed {str(e)}")
+            return constants.DELETION_FAILED
+        backup_object.deletion_requested_at = timeutils.utcnow()
+        backup_object.save()
+        return constants.DELETION_IN_PROGRESS
+
+    def check_backup_deletion(self, backup_object):
+        """Check a requested backup deletion
+
+        The backup object is removed once Cinder reports the backup gone.
+        If the deletion did not succeed, the request is cleared so the
+        backup is planned for deletion again.
+
+        :returns: the deletion state of the backup
+        """
+        project_id = backup_object.project_id
+        if project_id in self.project_list:
+            try:
+                self.set_backup_scope(project_id)
+                backup = self.openstacksdk.get_backup(
+                    uuid=backup_object.backup_id, project_id=project_id
                 )
-                LOG.debug(f"deletion failed {str(e)}")
+            except Exception as e:  # pylint: disable=W0703
+                LOG.debug(
+                    f"Failed to check deletion of backup {backup_object.backup_id}"
+                    f" {str(e)}"
+                )
+                return constants.DELETION_IN_PROGRESS
+            if backup is None:
+                LOG.info(f"Backup {backup_object.backup_id} is removed from Openstack.")
+                backup_object.delete_backup()
+                return constants.DELETION_DONE
+            if backup["status"] == "deleting":
+                return constants.DELETION_IN_PROGRESS
+            LOG.warn(
+                f"Deletion of backup {backup_object.backup_id} ended in "
+                f"{backup['status']} status, will retry later."
+            )
+        backup_object.deletion_requested_at = None
+        backup_object.save()
+        return constants.DELETION_FAILED
 
-                # Don't remove backup object, keep it and retry on next
-                # periodic task backup_object.delete_backup()
+    def update_project_list(self, project_ids=None):
+        """Load the projects from Keystone
 
-    def update_project_list(self):
+        :param project_ids: Projects needed by the caller. The projects are
+                            only listed when some of them are not loaded yet.
+        """
+        if project_ids is not None and set(project_ids) <= self.project_list.keys():
+            return
         projects = self.openstacksdk.get_projects()
         for project in projects:
             self.project_list[project.id] = project
 
-    def _is_backup_required(self, volume_id):
+    def get_backup_history(self, volume_ids):
+        """Get the backup history of volumes in batch
+
+        :param volume_ids: Target volume ids
+        :type: List<uuid string>
+
+        :return: backup history per volume, or None if it failed to query
+        :return type: dict
+        """
+        try:
+            return objects.Volume.get_backup_history(  # pylint: disable=E1120
+                context=self.ctx,
+                volume_ids=volume_ids,
+                depth=CONF.conductor.full_backup_depth,
+            )
+        except Exception as e:
+            LOG.debug(
+                "Failed to get backup history in batch, fall back to "
+                f"query it volume by volume. Reason: {e}"
+            )
+        return None
+
+    def _is_backup_required(self, volume_id, history=None):
         """Decide if the backup required based on the backup history
 
         If there is any backup created during certain time,
@@ -339,6 +557,9 @@ class Backup(object):
 
         :param volume_id: Target volume id
         :type: uuid string
+        :param history: Backup history from get_backup_history, queried
+                        for this volume only if not provided
+        :type: dict
 
         :return: if new backup required
         :return type: bool
@@ -350,6 +571,11 @@ class Backup(object):
                 return True
             interval = CONF.conductor.backup_min_interval
             threshold_strtime = timeutils.utcnow() - timedelta(seconds=interval)
+            if history is not None:
+                if volume_id not in history:
+                    return True
+                last_created_at = history[volume_id]["last_created_at"]
+                return last_created_at is None or last_created_at <= threshold_strtime
             backups = self.get_backups(
                 filters={
                     "volume_id__eq": volume_id,
@@ -367,7 +593,7 @@ class Backup(object):
             )
         return True
 
-    def _is_incremental(self, volume_id):
+    def _is_incremental(self, volume_id, history=None):
         """Decide the backup method based on the backup history
 
         It queries to select the last N backups from backup table and
@@ -376,6 +602,9 @@ class Backup(object):
 
         :param volume_id: Target volume id
         :type: uuid string
+        :param history: Backup history from get_backup_history, queried
+                        for this volume only if not provided
+        :type: dict
 
         :return: if backup method is incremental or not
         :return type: bool
@@ -384,14 +613,18 @@ class Backup(object):
         try:
             if CONF.conductor.full_backup_depth == 0:
                 return False
-            backups = self.get_backups(
-                filters={"volume_id__eq": volume_id},
-                limit=CONF.conductor.full_backup_depth,
-                sort_key="id",
-                sort_dir="desc",
-            )
-            for bk in backups:
-                if bk.incremental:
+            if history is not None:
+                incrementals = history.get(volume_id, {}).get("incremental", [])
+            else:
+                backups = self.get_backups(
+                    filters={"volume_id__eq": volume_id},
+                    limit=CONF.conductor.full_backup_depth,
+                    sort_key="id",
+                    sort_dir="desc",
+                )
+                incrementals = [bk.incremental for bk in backups]
+            for incremental in incrementals:
+                if incremental:
                     continue
                 else:
                     return True
@@ -408,14 +641,110 @@ class Backup(object):
         Function first list all the servers in the project and get the volumes
         that are attached to the instance.
 
-        Generate backup candidate list for later create tasks in queue
+        With CONF.conductor.discovery_all_projects_sweep, servers of all
+        projects are listed at once and grouped by project instead.
+
+        Projects are checked concurrently by up to
+        CONF.conductor.discovery_workers threads, and the candidates of a
+        project are yielded as soon as it is checked. A failure in one
+        project is logged without affecting the others.
+
+        Generate backup candidates for later create tasks in queue
         """
-        queues_map = []
         self.refresh_openstacksdk()
+        self.refresh_volume_index()
         projects = self.openstacksdk.get_projects()
         for project in projects:
-            empty_project = True
             self.project_list[project.id] = project
+
+        project_servers = None
+        if CONF.conductor.discovery_all_projects_sweep:
+            project_servers = self._get_servers_by_project()
+        if project_servers is not None:
+            # Projects without any server have nothing to back up.
+            projects = [
+                project for project in projects if project.id in project_servers
+            ]
+
+        if CONF.conductor.discovery_workers > 1:
+            yield from self._check_projects_concurrently(projects, project_servers)
+            return
+        for project in projects:
+            servers = (
+                project_servers[project.id] if project_servers is not None else None
+            )
+            try:
+                yield from self._check_project_volumes(project, servers)
+            except Exception as ex:  # pylint: disable=W0703
+                LOG.warn(f"Failed to check volumes in project {project.id}. {str(ex)}")
+
+    def _check_projects_concurrently(self, projects, project_servers=None):
+        """Check projects in a thread pool and yield candidates in order
+
+        At most discovery_workers projects are checked at the same time, so
+        only the candidates of those projects are held in memory. The
+        candidates are yielded in project order, as without a thread pool.
+        """
+        workers = CONF.conductor.discovery_workers
+        projects = iter(projects)
+        running = collections.deque()
+        with futurist.ThreadPoolExecutor(max_workers=workers) as executor:
+            while True:
+                while len(running) < workers:
+                    project = next(projects, None)
+                    if project is None:
+                        break
+                    servers = (
+                        project_servers[project.id]
+                        if project_servers is not None
+                        else None
+                    )
+                    future = executor.submit(
+                        list, self._check_project_volumes(project, servers)
+                    )
+                    running.append((project, future))
+                if not running:
+                    break
+                project, future = running.popleft()
+                try:
+                    tasks = future.result()
+                except Exception as ex:  # pylint: disable=W0703
+                    LOG.warn(
+                        f"Failed to check volumes in project {project.id}. "
+                        f"{str(ex)}"
+                    )
+                    continue
+                yield from tasks
+
+    def _get_servers_by_project(self):
+        """List servers of all projects at once and group them by project
+
+        :return: servers grouped by project id, or None if the listing failed
+        :return type: dict
+        """
+        project_servers = collections.defaultdict(list)
+        try:
+            for server in self.openstacksdk.get_servers(all_projects=True):
+                project_servers[server.project_id].append(server)
+        except OpenstackHttpException as ex:
+            LOG.warn(
+                "Failed to list servers for all projects, fall back to list "
+                f"servers project by project. {str(ex)} "
+                f"(status code: {ex.status_code})."
+            )
+            return None
+        return project_servers
+
+    def _check_project_volumes(self, project, servers=None):
+        """Generate backup candidates for the servers of one project
+
+        :param project: The project to check
+        :param servers: Servers of the project if already listed, otherwise
+                        they are listed from Nova.
+        :return: backup candidates of the project
+        :return type: Iterator<QueueMapping>
+        """
+        if servers is None:
             try:
                 servers = self.openstacksdk.get_servers(project_id=project.id)
             except OpenstackHttpException as ex:
@@ -423,57 +752,86 @@ class Backup(object):
                     f"Failed to list servers in project {project.id}. "
                     f"{str(ex)} (status code: {ex.status_code})."
                 )
+                return
+        # Servers are consumed page by page, and the backup history is
+        # queried once per batch of candidates.
+        batch_size = CONF.conductor.queue_write_batch_size
+        candidates = []
+        for server in servers:
+            if not self.filter_by_server_metadata(server.metadata):
                 continue
-            for server in servers:
-                if not self.filter_by_server_metadata(server.metadata):
-                    continue
-                if empty_project:
-                    empty_project = False
-                    self.result.add_project(project.id, project.name)
-                for volume in server.attached_volumes:
-                    filter_result = self.filter_by_volume_status(
-                        volume["id"], project.id
-                    )
+            for volume in server.attached_volumes:
+                filter_result = self.filter_by_volume_status(volume["id"], project.id)
 
-                    if not filter_result:
-                        continue
-                    backup_required = self._is_backup_required(volume["id"])
-                    if not backup_required:
-                        continue
+                if not filter_result:
+                    continue
+                candidates.append((server, volume, filter_result))
+            if len(candidates) >= batch_size:
+                yield from self._prepare_volume_tasks(project, candidates)
+                candidates = []
+        if candidates:
+            yield from self._prepare_volume_tasks(project, candidates)
+
+    def _prepare_volume_tasks(self, project, candidates):
+        """Generate the backup tasks of a batch of candidate volumes
+
+        :param project: The project of the candidates
+        :param candidates: (server, volume, filter result) tuples
+        :return type: Iterator<QueueMapping>
+        """
+        history = self.get_backup_history(
+            [volume["id"] for _server, volume, _result in candidates]
+        )
+        for server, volume, filter_result in candidates:
+            backup_required = self._is_backup_required(volume["id"], history)
+            if not backup_required:
+                continue
 
-                    if "name" not in volume or not volume["name"]:
-                        volume_name = volume["id"]
-                    else:
-                        volume_name = volume["name"][:100]
-                    if filter_result is True:
-                        backup_status = constants.BACKUP_PLANNED
-                        reason = None
-                    else:
-                        backup_status = constants.BACKUP_FAILED
-                        reason = filter_result
-                    incremental = self._is_incremental(volume["id"])
-                    backup_method = "Incremental" if incremental else "Full"
-                    LOG.info(
-                        "Prapering %s backup task for volume %s",
-                        backup_method,
-                        volume["id"],
-                    )
-                    queues_map.append(
-                        QueueMapping(
-                            project_id=project.id,
-                            volume_id=volume["id"],
-                            backup_id="NULL",
-                            instance_id=server.id,
-                            backup_status=backup_status,
-                            # Only keep the last 100 chars of instance_name and
-                            # volume_name for forming backup_name
-                            instance_name=server.name[:100],
-                            volume_name=volume_name,
-                            incremental=incremental,
-                            reason=reason,
-                        )
-                    )
-        return queues_map
+            if "name" in volume and volume["name"]:
+                volume_name = volume["name"][:100]
+            elif (
+                volume["id"] in self.volume_index
+                and self.volume_index[volume["id"]].name
+            ):
+                volume_name = self.volume_index[volume["id"]].name[:100]
+            else:
+                volume_name = volume["id"]
+            if filter_result is True:
+                backup_status = constants.BACKUP_PLANNED
+                reason = None
+            else:
+                backup_status = constants.BACKUP_FAILED
+                reason = filter_result
+            incremental = self._is_incremental(volume["id"], history)
+            backup_method = "Incremental" if incremental else "Full"
+            LOG.info(
+                "Prapering %s backup task for volume %s",
+                backup_method,
+                volume["id"],
+            )
+            yield QueueMapping(
+                project_id=project.id,
+                volume_id=volume["id"],
+                backup_id="NULL",
+                instance_id=server.id,
+                backup_status=backup_status,
+                # Only keep the last 100 chars of instance_name and
+                # volume_name for forming backup_name
+                instance_name=server.name[:100],
+                volume_name=volume_name,
+                incremental=incremental,
+                reason=reason,
+                volume_size=(
+                    self.volume_index[volume["id"]].size
+                    if volume["id"] in self.volume_index
+                    else None
+                ),
+                availability_zone=(
+                    self.volume_index[volume["id"]].availability_zone
+                    if volume["id"] in self.volume_index
+                    else None
+                ),
+            )
 
     def collect_instance_retention_map(self):
         """Retrieves instance backup retention map"""
@@ -514,33 +872,42 @@ class Backup(object):
                     )
         return retention_map
 
-    def _volume_queue(self, task):
-        """Commits one backup task to queue table
+    def _volume_queue(self, tasks):
+        """Commits backup tasks to queue table in batch
 
-        :param task: One backup task
-        :type: QueueMapping
+        :param tasks: Backup tasks
+        :type: List<QueueMapping>
         """
-        volume_queue = objects.Queue(self.ctx)
-        volume_queue.backup_id = task.backup_id
-        volume_queue.volume_id = task.volume_id
-        volume_queue.instance_id = task.instance_id
-        volume_queue.project_id = task.project_id
-        volume_queue.backup_status = task.backup_status
-        volume_queue.instance_name = task.instance_name
-        volume_queue.volume_name = task.volume_name
-        # NOTE(Oleks): Backup mode is inherited from backup service.
-        # Need to keep and navigate backup mode history, to decide a different
-        # mode per volume
-        volume_queue.incremental = task.incremental
-
-        backup_method = "Incremental" if task.incremental else "Full"
-        LOG.info(
-            _(
-                ("Schedule %s backup task for volume %s.")
-                % (backup_method, task.volume_id)
+        queues = []
+        for task in tasks:
+            queues.append(
+                {
+                    "backup_id": task.backup_id,
+                    "volume_id": task.volume_id,
+                    "instance_id": task.instance_id,
+                    "project_id": task.project_id,
+                    "backup_status": task.backup_status,
+                    "instance_name": task.instance_name,
+                    "volume_name": task.volume_name,
+                    # NOTE(Oleks): Backup mode is inherited from backup
+                    # service. Need to keep and navigate backup mode history,
+                    # to decide a different mode per volume
+                    "incremental": task.incremental,
+                    "reason": task.reason,
+                    "volume_size": task.volume_size,
+                    "availability_zone": task.availability_zone,
+                }
             )
+            backup_method = "Incremental" if task.incremental else "Full"
+            LOG.info(
+                _(
+                    ("Schedule %s backup task for volume %s.")
+                    % (backup_method, task.volume_id)
+                )
+            )
+        return objects.Queue.create_bulk(  # pylint: disable=E1120
+            context=self.ctx, queues=queues
         )
-        return volume_queue.create()
 
     def create_volume_backup(self, task):
         """Initiate the backup of the volume
@@ -591,6 +958,7 @@ class Backup(object):
                 )
                 task.backup_id = volume_backup.id
                 task.backup_status = constants.BACKUP_WIP
+                self._schedule_next_check(task)
                 task.save()
             except OpenstackSDKException as error:
                 inc_err_msg = "No backups available to do an incremental backup"
@@ -632,6 +1000,78 @@ class Backup(object):
             # Remove this task from the task list
             task.delete_queue()
 
+    def dispatch_volume_backups(self, tasks):
+        """Create the volume backups of tasks concurrently
+
+        Backup creations are issued from a pool of backup_dispatch_workers
+        threads. Tasks are pulled lazily from the given iterable and the
+        number of backups created at the same time is capped globally, per
+        project and per availability zone. Tasks over a cap wait until a
+        creation in the same project or zone is done.
+
+        :param tasks: The tasks to create the backups for.
+        :type: Iterable<Queue>
+        """
+        workers = CONF.conductor.backup_dispatch_workers
+        if workers <= 1:
+            for task in tasks:
+                self.create_volume_backup(task)
+            return
+
+        limits = {
+            "project_id": CONF.conductor.backup_dispatch_max_per_project,
+            "availability_zone": CONF.conductor.backup_dispatch_max_per_az,
+        }
+        running = {}
+        in_flight = {key: collections.Counter() for key in limits}
+        pending = collections.deque()
+        max_pending = workers * 4
+        tasks = iter(tasks)
+        exhausted = False
+
+        def dispatchable(task):
+            for key, limit in limits.items():
+                if limit and in_flight[key][getattr(task, key)] >= limit:
+                    return False
+            return True
+
+        def next_task():
+            for task in pending:
+                if dispatchable(task):
+                    pending.remove(task)
+                    return task
+            return None
+
+        with futurist.ThreadPoolExecutor(max_workers=workers) as executor:
+            while True:
+                while len(running) < workers:
+                    task = next_task()
+                    if task is None:
+                        if exhausted or len(pending) >= max_pending:
+                            break
+                        try:
+                            pending.append(next(tasks))
+                        except StopIteration:
+                            exhausted = True
+                        continue
+                    for key in limits:
+                        in_flight[key][getattr(task, key)] += 1
+                    running[executor.submit(self.create_volume_backup, task)] = task
+                if not running:
+                    break
+                done, _not_done = waiters.wait_for_any(list(running))
+                for future in done:
+                    task = running.pop(future)
+                    for key in limits:
+                        in_flight[key][getattr(task, key)] -= 1
+                    try:
+                        future.result()
+                    except Exception as ex:  # pylint: disable=W0703
+                        LOG.warn(
+                            "Failed to create backup for volume "
+                            f"{task.volume_id}. {str(ex)}"
+                        )
+
     # backup gen was not created
     def process_pre_failed_backup(self, task):
         # 1.notify via email
@@ -686,11 +1126,65 @@ class Backup(object):
         # treat same as the available backup for now
         self.process_available_backup(task)
 
-    def check_volume_backup_status(self, queue):
+    def set_backup_scope(self, project_id):
+        """Scope the next backup get, list and delete calls to a project
+
+        In admin scope mode, backups are reached with the admin connection
+        and no project scoped connection is needed.
+        """
+        if not self.openstacksdk.admin_scope:
+            self.openstacksdk.set_project(self.project_list[project_id])
+
+    def list_creating_backups(self, queues):
+        """List the backups still being created for a set of tasks
+
+        Backups are listed once per project of the given tasks, filtered
+        by the creating status, instead of fetching them one by one.
+        Listing failures are logged and the backups of that project will
+        be fetched one by one.
+
+        :params: queues: The tasks to list the backups for.
+        :return: creating backups mapped by backup id
+        :return type: dict
+        """
+        backups = {}
+        project_ids = {
+            queue.project_id for queue in queues if queue.backup_id != "NULL"
+        }
+        if project_ids and self.openstacksdk.admin_scope:
+            try:
+                for backup in self.openstacksdk.get_backups(
+                    all_projects=True, status="creating"
+                ):
+                    backups[backup.id] = backup
+            except OpenstackSDKException as ex:
+                LOG.warn(
+                    "Failed to list creating backups of all projects, fall "
+                    f"back to get backups one by one. {str(ex)}"
+                )
+            return backups
+        for project_id in project_ids:
+            if project_id not in self.project_list:
+                continue
+            try:
+                self.openstacksdk.set_project(self.project_list[project_id])
+                for backup in self.openstacksdk.get_backups(status="creating"):
+                    backups[backup.id] = backup
+            except OpenstackSDKException as ex:
+                LOG.warn(
+                    f"Failed to list creating backups in project {project_id}, "
+                    f"fall back to get backups one by one. {str(ex)}"
+                )
+        return backups
+
+    def check_volume_backup_status(self, queue, creating_backups=None):
         """Checks the backup status of the volume
 
         :params: queue: Provide the map of the volume that needs backup
                  status checked.
+        :params: creating_backups: Backups known to be in creating status
+                 from list_creating_backups. The backup of the task is only
+                 fetched from Cinder when it is not part of them.
         Call the backups api to see if the backup is successful.
         """
         project_id = queue.project_id
@@ -702,8 +1196,11 @@ class Backup(object):
         if project_id not in self.project_list:
             self.process_non_existing_backup(queue)
             return
-        self.openstacksdk.set_project(self.project_list[project_id])
-        backup_gen = self.openstacksdk.get_backup(queue.backup_id)
+        if creating_backups and queue.backup_id in creating_backups:
+            backup_gen = creating_backups[queue.backup_id]
+        else:
+            self.set_backup_scope(project_id)
+            backup_gen = self.openstacksdk.get_backup(queue.backup_id)
 
         if backup_gen is None:
             # TODO(Alex): need to check when it is none
@@ -715,12 +1212,73 @@ class Backup(object):
         if backup_gen.status == "error":
             self.process_failed_backup(queue)
         elif backup_gen.status == "available":
+            self._observe_backup_throughput(backup_gen)
             self.process_available_backup(queue)
         elif backup_gen.status == "creating":
             LOG.info("Waiting for backup of %s to be completed" % queue.volume_id)
+            elapsed = 0
+            created_at = self._parse_backup_time(backup_gen.created_at)
+            if created_at is not None:
+                elapsed = (timeutils.utcnow() - created_at).total_seconds()
+            self._schedule_next_check(queue, elapsed=elapsed)
+            queue.save()
         else:  # "deleting", "restoring", "error_restoring" status
             self.process_using_backup(queue)
 
+    @staticmethod
+    def _parse_backup_time(value):
+        try:
+            return timeutils.normalize_time(timeutils.parse_isotime(value))
+        except (AttributeError, TypeError, ValueError):
+            return None
+
+    def _observe_backup_throughput(self, backup_gen):
+        """Refine the backup throughput estimation with a finished backup"""
+        created_at = self._parse_backup_time(backup_gen.created_at)
+        updated_at = self._parse_backup_time(backup_gen.updated_at)
+        if created_at is None or updated_at is None:
+            return
+        duration = (updated_at - created_at).total_seconds()
+        if duration <= 0 or not isinstance(backup_gen.size, int):
+            return
+        incremental = bool(backup_gen.is_incremental)
+        throughput = backup_gen.size * 1024 / duration
+        self.backup_throughput[incremental] = (
+            0.8 * self.backup_throughput[incremental] + 0.2 * throughput
+        )
+
+    def _schedule_next_check(self, task, elapsed=0):
+        """Decide when to check the backup status of a task next time
+
+        The next check is set to the estimated completion time of the
+        backup, from the volume size and the observed throughput. Backups
+        lasting longer than estimated are checked less and less often.
+        The interval is bounded by CONF.conductor.wip_poll_min_interval and
+        CONF.conductor.wip_poll_max_interval.
+
+        :param task: The WIP task
+        :param elapsed: Seconds since the backup creation started
+        """
+        if CONF.conductor.backup_notifications_enabled:
+            # Completion is reported by notifications, polling is only
+            # a safety net.
+            task.next_check_at = timeutils.utcnow() + timedelta(
+                seconds=CONF.conductor.wip_poll_max_interval
+            )
+            return
+        if task.volume_size:
+            estimation = (
+                task.volume_size * 1024 / self.backup_throughput[bool(task.incremental)]
+            )
+        else:
+            estimation = 0
+        delay = max(estimation - elapsed, elapsed / 4)
+        delay = min(
+            max(delay, CONF.conductor.wip_poll_min_interval),
+            CONF.conductor.wip_poll_max_interval,
+        )
+        task.next_check_at = timeutils.utcnow() + timedelta(seconds=delay)
+
     def _volume_backup(self, task):
         # matching_backups = [
         #     g for g in self.available_backups
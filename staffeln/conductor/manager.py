@@ -1,10 +1,13 @@
 from __future__ import annotations
 
+import socket
 import threading
 import time
 from datetime import timedelta, timezone
 
 import cotyledon
+import futurist
+import tooz
 from futurist import periodics
 from oslo_log import log
 from oslo_utils import timeutils
@@ -14,6 +17,8 @@ from staffeln import objects
 from staffeln.common import constants, context, lock
 from staffeln.common import time as xtime
 from staffeln.conductor import backup as backup_controller
+from staffeln.conductor import notification
+from staffeln.conductor import retention as retention_planner
 from staffeln.i18n import _
 
 LOG = log.getLogger(__name__)
@@ -30,54 +35,113 @@ class BackupManager(cotyledon.Service):
         self.ctx = context.make_context()
         self.lock_mgt = lock.LockManager()
         self.controller = backup_controller.Backup()
+        self.worker_name = f"{socket.gethostname()}-{worker_id}"
+        self.partitioned = False
         LOG.info("%s init" % self.name)
 
     def run(self):
         LOG.info("%s run" % self.name)
+        self._join_backup_workers()
         self.backup_engine(CONF.conductor.backup_service_period)
 
     def terminate(self):
         LOG.info("%s terminate" % self.name)
+        self.lock_mgt.terminate()
         super(BackupManager, self).terminate()
 
     def reload(self):
         LOG.info("%s reload" % self.name)
 
-    # Manage active backup generators
-    def _process_wip_tasks(self):
-        LOG.info(_("Processing WIP backup generators..."))
-        # TODO(Alex): Replace this infinite loop with finite time
-        self.cycle_start_time = xtime.get_current_time()
+    def _join_backup_workers(self):
+        """Share the backup tasks with the other backup workers
 
-        # loop - take care of backup result while timeout
-        while 1:
-            queues_started = self.controller.get_queues(
-                filters={"backup_status": constants.BACKUP_WIP}
+        Projects are partitioned among the live backup workers, and each
+        worker only processes the tasks of its own projects. Without a
+        coordination backend supporting it, every worker processes all
+        tasks and relies on the per-volume locks instead.
+        """
+        coordinator = self.lock_mgt.coordinator
+        if not coordinator.supports_partitioning:
+            LOG.info(
+                "Backup tasks are not partitioned among workers, the "
+                "coordination backend does not support it."
             )
-            if len(queues_started) == 0:
-                LOG.info(_("task queue empty"))
-                break
-            if not self._backup_cycle_timeout():  # time in
-                LOG.info(_("cycle timein"))
-                for queue in queues_started:
-                    LOG.debug(
-                        "try to get lock and run task for volume: "
-                        f"{queue.volume_id}."
-                    )
-                    with lock.Lock(
-                        self.lock_mgt, queue.volume_id, remove_lock=True
-                    ) as q_lock:
-                        if q_lock.acquired:
-                            self.controller.check_volume_backup_status(queue)
-            else:  # time out
-                LOG.info(_("cycle timeout"))
-                for queue in queues_started:
-                    self.controller.hard_cancel_backup_task(queue)
-                break
-            time.sleep(constants.BACKUP_RESULT_CHECK_INTERVAL)
+            return
+        coordinator.ensure_started()
+        try:
+            coordinator.join_partitioned_group(constants.BACKUP_WORKERS)
+        except tooz.NotImplemented as ex:
+            # The tooz driver cannot watch the group members
+            LOG.info(f"Backup tasks are not partitioned among workers. {str(ex)}")
+            return
+        self.partitioned = True
+
+    def _refresh_partitions(self):
+        if not self.partitioned:
+            return
+        try:
+            self.lock_mgt.coordinator.run_watchers()
+        except Exception as ex:  # pylint: disable=W0703
+            LOG.warning(f"Failed to refresh backup workers membership. {str(ex)}")
+
+    def _owns_project(self, project_id):
+        return self.lock_mgt.coordinator.belongs_to_self(
+            constants.BACKUP_WORKERS, project_id
+        )
 
-    # if the backup cycle timeout, then return True
-    def _backup_cycle_timeout(self):
+    # Manage active backup generators
+    def _process_wip_tasks(self):
+        """Check the WIP tasks which are due once
+
+        Tasks started longer than the backup cycle timeout ago are
+        cancelled, the others are checked when their next check time is
+        reached.
+        """
+        LOG.info(_("Processing WIP backup generators..."))
+        queues_started = self.controller.get_queues(
+            filters={"backup_status": constants.BACKUP_WIP}
+        )
+        if self.partitioned:
+            self._refresh_partitions()
+            queues_started = [
+                queue
+                for queue in queues_started
+                if self._owns_project(queue.project_id)
+            ]
+        if len(queues_started) == 0:
+            LOG.info(_("task queue empty"))
+            return
+        # Discovery may not have run in this worker yet
+        self.controller.update_project_list(
+            {queue.project_id for queue in queues_started}
+        )
+        timeout_threshold = self._backup_cycle_timeout_threshold()
+        now = timeutils.utcnow()
+        due_queues = []
+        for queue in queues_started:
+            if self._backup_task_timeout(queue, timeout_threshold):
+                LOG.info(f"Backup task of volume {queue.volume_id} timed out.")
+                with lock.Lock(
+                    self.lock_mgt, queue.volume_id, remove_lock=True
+                ) as q_lock:
+                    if q_lock.acquired:
+                        self.controller.hard_cancel_backup_task(queue)
+            elif (
+                queue.next_check_at is None
+                or queue.next_check_at.replace(tzinfo=None) <= now
+            ):
+                due_queues.append(queue)
+        if not due_queues:
+            return
+        creating_backups = self.controller.list_creating_backups(due_queues)
+        for queue in due_queues:
+            LOG.debug(f"try to get lock and run task for volume: {queue.volume_id}.")
+            with lock.Lock(self.lock_mgt, queue.volume_id, remove_lock=True) as q_lock:
+                if q_lock.acquired:
+                    self.controller.check_volume_backup_status(queue, creating_backups)
+
+    # the creation time before which backup tasks are timed out
+    def _backup_cycle_timeout_threshold(self):
         time_delta_dict = xtime.parse_timedelta_string(
             CONF.conductor.backup_cycle_timout
         )
@@ -93,7 +157,7 @@ class BackupManager(cotyledon.Service):
             time_delta_dict = xtime.parse_timedelta_string(
                 constants.DEFAULT_BACKUP_CYCLE_TIMEOUT
             )
-        rto = xtime.timeago(
+        return xtime.timeago(
             years=time_delta_dict["years"],
             months=time_delta_dict["months"],
             weeks=time_delta_dict["weeks"],
@@ -102,42 +166,66 @@ class BackupManager(cotyledon.Service):
             minutes=time_delta_dict["minutes"],
             seconds=time_delta_dict["seconds"],
         )
-        # print(rto.strftime(xtime.DEFAULT_TIME_FORMAT))
-        # print(self.cycle_start_time)
-        # print(self.cycle_start_time - rto)
-        if rto >= self.cycle_start_time:
-            return True
-        return False
+
+    # if the backup task timeout, then return True
+    def _backup_task_timeout(self, queue, threshold):
+        # Tasks claimed before started_at existed fall back to created_at
+        started_at = queue.started_at or queue.created_at
+        if started_at is None:
+            return False
+        return started_at.replace(tzinfo=None) <= threshold
 
     # Create backup generators
     def _process_todo_tasks(self):
         LOG.info(_("Creating new backup generators..."))
-        tasks_to_start = self.controller.get_queues(
-            filters={"backup_status": constants.BACKUP_PLANNED}
-        )
-        if len(tasks_to_start) != 0:
-            for task in tasks_to_start:
-                with lock.Lock(
-                    self.lock_mgt, task.volume_id, remove_lock=True
-                ) as t_lock:
-                    if t_lock.acquired:
-                        # Re-pulling status and make it's up-to-date
-                        task = self.controller.get_queue_task_by_id(task_id=task.id)
-                        if task.backup_status == constants.BACKUP_PLANNED:
-                            task.backup_status = constants.BACKUP_INIT
-                            task.save()
-                            self.controller.create_volume_backup(task)
+        self.controller.dispatch_volume_backups(self._claim_todo_tasks())
+
+    def _claim_todo_tasks(self):
+        """Yield planned tasks, claiming them batch by batch when needed"""
+        project_ids = None
+        if self.partitioned:
+            self._refresh_partitions()
+            project_ids = [
+                project_id
+                for project_id in self.controller.get_queue_project_ids(
+                    constants.BACKUP_PLANNED
+                )
+                if self._owns_project(project_id)
+            ]
+            if not project_ids:
+                return
+        while True:
+            # Claiming moves the tasks to BACKUP_INIT in the database, so
+            # other workers never pick the same task.
+            tasks_to_start = self.controller.claim_queue_tasks(
+                constants.BACKUP_PLANNED,
+                limit=CONF.conductor.task_claim_batch_size,
+                worker_id=self.worker_name,
+                project_ids=project_ids,
+            )
+            if not tasks_to_start:
+                break
+            # Discovery may not have run in this worker yet
+            self.controller.update_project_list(
+                {task.project_id for task in tasks_to_start}
+            )
+            yield from tasks_to_start
 
     # Refresh the task queue
     def _update_task_queue(self):
         LOG.info(_("Updating backup task queue..."))
         self.controller.refresh_openstacksdk()
-        self.controller.refresh_backup_result()
-        filters = {"backup_status": constants.BACKUP_WIP}
-        current_wip_tasks = self.controller.get_queues(filters=filters)
-        filters["backup_status"] = constants.BACKUP_PLANNED
-        current_plan_tasks = self.controller.get_queues(filters=filters)
-        self.controller.create_queue(current_plan_tasks + current_wip_tasks)
+        # Claimed tasks stay in BACKUP_INIT until their backup is created,
+        # which may happen while discovery runs.
+        old_tasks = []
+        for status in (
+            constants.BACKUP_PLANNED,
+            constants.BACKUP_INIT,
+            constants.BACKUP_WIP,
+        ):
+            filters = {"backup_status": status}
+            old_tasks += self.controller.get_queues(filters=filters)
+        self.controller.create_queue(old_tasks)
 
     def _report_backup_result(self):
         report_period = CONF.conductor.report_period
@@ -168,32 +256,87 @@ class BackupManager(cotyledon.Service):
         LOG.info("Backup manager started %s" % str(time.time()))
         LOG.info("%s periodics" % self.name)
 
+        # The stages of a backup cycle run at their own pace and only share
+        # the queue table, so a slow stage does not hold back the others.
         @periodics.periodic(spacing=backup_service_period, run_immediately=True)
-        def backup_tasks():
+        def discovery_tasks():
             with self.lock_mgt:
                 with lock.Lock(self.lock_mgt, constants.PULLER) as puller:
                     if puller.acquired:
                         LOG.info("Running as puller role")
                         self._update_task_queue()
-                        self._process_todo_tasks()
-                        self._process_wip_tasks()
+
+        @periodics.periodic(
+            spacing=CONF.conductor.backup_dispatch_period, run_immediately=True
+        )
+        def dispatch_tasks():
+            self._process_todo_tasks()
+
+        @periodics.periodic(
+            spacing=CONF.conductor.wip_poll_min_interval, run_immediately=True
+        )
+        def wip_tasks():
+            with self.lock_mgt:
+                self._process_wip_tasks()
+
+        @periodics.periodic(spacing=backup_service_period, run_immediately=True)
+        def report_tasks():
+            with self.lock_mgt:
+                with lock.Lock(self.lock_mgt, constants.REPORTER) as reporter:
+                    if reporter.acquired:
                         self._report_backup_result()
-                    else:
-                        LOG.info("Running as non-puller role")
-                        self._process_todo_tasks()
-                        self._process_wip_tasks()
 
         periodic_callables = [
-            (backup_tasks, (), {}),
+            (discovery_tasks, (), {}),
+            (dispatch_tasks, (), {}),
+            (wip_tasks, (), {}),
+            (report_tasks, (), {}),
         ]
         periodic_worker = periodics.PeriodicWorker(
-            periodic_callables, schedule_strategy="last_finished"
+            periodic_callables,
+            executor_factory=lambda: futurist.ThreadPoolExecutor(
+                max_workers=len(periodic_callables)
+            ),
+            schedule_strategy="last_finished",
         )
         periodic_thread = threading.Thread(target=periodic_worker.start)
         periodic_thread.daemon = True
         periodic_thread.start()
 
 
+class NotificationManager(cotyledon.Service):
+    name = "Staffeln conductor backup notification listener"
+
+    def __init__(self, worker_id, conf):
+        super(NotificationManager, self).__init__(worker_id)
+        self.conf = conf
+        self.lock_mgt = lock.LockManager()
+        self.controller = backup_controller.Backup()
+        self.listener = None
+        LOG.info(f"{self.name} init")
+
+    def run(self):
+        LOG.info(f"{self.name} run")
+        self.lock_mgt.coordinator.ensure_started()
+        self.controller.update_project_list()
+        endpoint = notification.BackupNotificationEndpoint(
+            self.controller, self.lock_mgt
+        )
+        self.listener = notification.get_backup_notification_listener(CONF, endpoint)
+        self.listener.start()
+
+    def terminate(self):
+        LOG.info(f"{self.name} terminate")
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener.wait()
+        self.lock_mgt.terminate()
+        super(NotificationManager, self).terminate()
+
+    def reload(self):
+        LOG.info(f"{self.name} reload")
+
+
 class RotationManager(cotyledon.Service):
     name = "Staffeln conductor rotation controller"
 
@@ -211,45 +354,73 @@ class RotationManager(cotyledon.Service):
 
     def terminate(self):
         LOG.info(f"{self.name} terminate")
+        self.lock_mgt.terminate()
         super(RotationManager, self).terminate()
 
     def reload(self):
         LOG.info(f"{self.name} reload")
 
-    def get_backup_list(self, filters=None):
-        return self.controller.get_backups(filters=filters)
-
-    def remove_backups(self, retention_backups):
-        LOG.info(f"Backups to be removed: {retention_backups}")
-        for retention_backup in retention_backups:
-            self.controller.hard_remove_volume_backup(retention_backup)
-
-    def is_retention(self, backup):
-        now = timeutils.utcnow().astimezone(timezone.utc)
-        backup_age = now - backup.created_at.astimezone(timezone.utc)
-        # see if need to be delete.
-        if backup.instance_id in self.instance_retention_map:
-            retention_time = now - self.get_time_from_str(
-                self.instance_retention_map[backup.instance_id]
-            ).astimezone(timezone.utc)
-            if backup_age > retention_time:
-                # Backup remain longer than retention, need to purge it.
+    def _rotate_backups(self, policies, timeout):
+        """Delete the expired backups batch by batch
+
+        The expired backups are planned and deleted in batches of
+        retention_page_size backups, so only the backup history of the
+        volumes of one batch is kept in memory at once.
+
+        :returns: the number of backups removed
+        """
+        deadline = time.monotonic() + timeout
+        pipeline = retention_planner.DeletionPipeline(self.controller)
+        # Deletions requested by previous cycles
+        in_flight = self.controller.get_backups(
+            filters={"deletion_requested_at__neq": None}
+        )
+        in_flight_ids = {backup.backup_id for backup in in_flight}
+        expired_backups = self.controller.get_expired_backups(
+            default_cutoff=self.threshold_strtime,
+            instance_cutoffs=policies.get_cutoffs(self.instance_retention_map),
+        )
+        removed = 0
+        for batch in retention_planner.batch_expired_backups(
+            expired_backups, CONF.conductor.retention_page_size
+        ):
+            # Backups have dependency with each other after we
+            # enable incremental backup. Incremental backups are
+            # removed before the backups they are based on, and
+            # backups with dependents to keep are not removed.
+            dependents = retention_planner.build_dependents(
+                self.controller.get_volumes_backups(
+                    {backup.volume_id for backup in batch}
+                )
+            )
+            deletions, skipped = retention_planner.plan_deletions(batch, dependents)
+            for backup in skipped:
                 LOG.debug(
-                    "Found potential volume backup for retention: Backup "
-                    f"ID: {backup.backup_id} "
-                    f"with backup age: {backup_age} (Target retention "
-                    f"time: {retention_time})."
+                    f"Retention: Keep volume backup {backup.backup_id}"
+                    " as backups not expired yet depend on it."
                 )
-                return True
-        elif now - self.threshold_strtime < backup_age:
-            LOG.debug(
-                "Found potential volume backup for retention: "
-                f"Backup ID: {backup.backup_id} "
-                f"with backup age: {backup_age} (Default retention "
-                f"time: {self.threshold_strtime})."
+            # The deletions of previous cycles are followed by the first
+            # batch, later batches leave them to the next cycle.
+            if not in_flight:
+                deletions = [
+                    backup
+                    for backup in deletions
+                    if backup.backup_id not in in_flight_ids
+                ]
+            removed += pipeline.run(
+                deletions,
+                dependents,
+                in_flight=in_flight,
+                timeout=max(deadline - time.monotonic(), 0),
+            )
+            in_flight = []
+            if time.monotonic() >= deadline:
+                return removed
+        if in_flight:
+            removed += pipeline.run(
+                [], {}, in_flight=in_flight, timeout=max(deadline - time.monotonic(), 0)
             )
-            return True
-        return False
+        return removed
 
     def rotation_engine(self, retention_service_period):
         LOG.info(f"{self.name} rotation_engine")
@@ -264,9 +435,17 @@ class RotationManager(cotyledon.Service):
                     LOG.info("Starting task to check rotation...")
                     self.controller.refresh_openstacksdk()
                     # get the threshold time
-                    self.threshold_strtime = self.get_time_from_str(
-                        CONF.conductor.retention_time
-                    ).astimezone(timezone.utc)
+                    policies = retention_planner.RetentionPolicies()
+                    default_policy = policies.get(CONF.conductor.retention_time)
+                    if not default_policy.valid:
+                        LOG.info(
+                            _(
+                                "Retention time format is invalid. "
+                                "Follow <YEARS>y<MONTHS>m<WEEKS>w<DAYS>d"
+                                "<HOURS>h<MINUTES>min<SECONDS>s."
+                            )
+                        )
+                    self.threshold_strtime = default_policy.cutoff
                     self.instance_retention_map = (
                         self.controller.collect_instance_retention_map()
                     )
@@ -276,43 +455,14 @@ class RotationManager(cotyledon.Service):
                         not self.instance_retention_map
                     ):
                         return
-                    backup_instance_map = {}
 
                     # get project list
                     self.controller.update_project_list()
 
-                    for backup in self.get_backup_list():
-                        # Create backup instance map for later sorted by
-                        # created_at. This can be use as base of judgement
-                        # on delete a backup. The reason we need such list
-                        # is because backup have dependency with each other
-                        # after we enable incremental backup.
-                        # So we need to have information to judge on.
-                        if backup.instance_id in backup_instance_map:
-                            backup_instance_map[backup.instance_id].append(backup)
-                        else:
-                            backup_instance_map[backup.instance_id] = [backup]
-
-                    # Sort backup instance map and use it to check backup
-                    # create time and order.
-                    for instance_id in backup_instance_map:
-                        sorted_backup_list = sorted(
-                            backup_instance_map[instance_id],
-                            key=lambda backup: backup.created_at.timestamp(),
-                            reverse=True,
-                        )
-                        for backup in sorted_backup_list:
-                            if self.is_retention(backup):
-                                LOG.debug(
-                                    "Retention: Try to remove volume backup "
-                                    f"{backup.backup_id}"
-                                )
-                                # Try to delete and skip any incremental
-                                # exist error.
-                                self.controller.hard_remove_volume_backup(
-                                    backup, skip_inc_err=True
-                                )
-                                time.sleep(2)
+                    removed = self._rotate_backups(
+                        policies, timeout=retention_service_period
+                    )
+                    LOG.info(f"Retention: {removed} volume backups removed.")
 
         periodic_callables = [
             (rotation_tasks, (), {}),
@@ -323,27 +473,3 @@ class RotationManager(cotyledon.Service):
         periodic_thread = threading.Thread(target=periodic_worker.start)
         periodic_thread.daemon = True
         periodic_thread.start()
-
-    # get time
-    def get_time_from_str(self, time_str, to_str=False):
-        time_delta_dict = xtime.parse_timedelta_string(time_str)
-        if time_delta_dict is None:
-            LOG.info(
-                _(
-                    "Retention time format is invalid. "
-                    "Follow <YEARS>y<MONTHS>m<WEEKS>w<DAYS>d<HOURS>h"
-                    "<MINUTES>min<SECONDS>s."
-                )
-            )
-            return None
-
-        res = xtime.timeago(
-            years=time_delta_dict["years"],
-            months=time_delta_dict["months"],
-            weeks=time_delta_dict["weeks"],
-            days=time_delta_dict["days"],
-            hours=time_delta_dict["hours"],
-            minutes=time_delta_dict["minutes"],
-            seconds=time_delta_dict["seconds"],
-        )
-        return res.strftime(xtime.DEFAULT_TIME_FORMAT) if to_str else res
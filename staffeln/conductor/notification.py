@@ -0,0 +1,95 @@
+"""Cinder backup notification consumer"""
+
+from __future__ import annotations
+
+import oslo_messaging
+from oslo_log import log
+
+import staffeln.conf
+from staffeln.common import constants, lock
+
+CONF = staffeln.conf.CONF
+LOG = log.getLogger(__name__)
+
+
+class BackupNotificationEndpoint(object):
+    """Complete WIP backup tasks from Cinder backup notifications
+
+    Cinder emits backup.create.end when a backup finishes, with the
+    final backup status in the payload, and backup.create.error when it
+    fails. The matching WIP task in queue_data is processed right away,
+    the same way the status polling would do it.
+    """
+
+    filter_rule = oslo_messaging.NotificationFilter(
+        event_type=r"^backup\.create\.(end|error)$"
+    )
+
+    def __init__(self, controller, lock_mgt):
+        self.controller = controller
+        self.lock_mgt = lock_mgt
+
+    def info(self, ctxt, publisher_id, event_type, payload, metadata):
+        return self._process(event_type, payload)
+
+    def error(self, ctxt, publisher_id, event_type, payload, metadata):
+        return self._process(event_type, payload)
+
+    def _process(self, event_type, payload):
+        backup_id = payload.get("backup_id")
+        if not backup_id:
+            return oslo_messaging.NotificationResult.HANDLED
+        task = self.controller.get_queue_task_by_backup_id(backup_id)
+        if task is None:
+            # Not a backup created by Staffeln
+            return oslo_messaging.NotificationResult.HANDLED
+
+        with lock.Lock(self.lock_mgt, task.volume_id, remove_lock=True) as t_lock:
+            if not t_lock.acquired:
+                # The task is being checked by a backup worker, deliver
+                # the notification again once it is done.
+                LOG.debug(
+                    f"Requeue {event_type} notification of backup {backup_id}, "
+                    "the task is being processed by another worker."
+                )
+                return oslo_messaging.NotificationResult.REQUEUE
+            # Re-pulling status and make it's up-to-date
+            task = self.controller.get_queue_task_by_id(task_id=task.id)
+            if task is None or task.backup_status != constants.BACKUP_WIP:
+                return oslo_messaging.NotificationResult.HANDLED
+
+            LOG.info(
+                f"Received {event_type} notification for backup {backup_id} "
+                f"of volume {task.volume_id}."
+            )
+            if event_type == "backup.create.error" or payload.get("status") == "error":
+                if task.project_id not in self.controller.project_list:
+                    self.controller.update_project_list()
+                if task.project_id in self.controller.project_list:
+                    self.controller.set_backup_scope(task.project_id)
+                self.controller.process_failed_backup(task)
+            elif payload.get("status") == "available":
+                self.controller.process_available_backup(task)
+        return oslo_messaging.NotificationResult.HANDLED
+
+
+def get_backup_notification_listener(conf, endpoint):
+    """Create the listener of Cinder backup notifications
+
+    :param conf: The configuration object
+    :param endpoint: The notification endpoint
+    :returns: a notification listener, not started yet
+    """
+    transport = oslo_messaging.get_notification_transport(conf)
+    targets = [
+        oslo_messaging.Target(topic=topic)
+        for topic in conf.conductor.backup_notification_topics
+    ]
+    return oslo_messaging.get_notification_listener(
+        transport,
+        targets,
+        [endpoint],
+        executor="threading",
+        allow_requeue=True,
+        pool=conf.conductor.backup_notification_pool,
+    )
@@ -17,13 +17,10 @@ LOG = log.getLogger(__name__)
 class BackupResult(object):
     def __init__(self, backup_mgt):
         self.backup_mgt = backup_mgt
+        self.initialize()
 
     def initialize(self):
         self.content = ""
-        self.project_list = set()
-
-    def add_project(self, project_id, project_name):
-        self.project_list.add((project_id, project_name))
 
     def send_result_email(self, project_id, subject=None, project_name=None):
         if not CONF.notification.sender_email:
@@ -0,0 +1,252 @@
+"""Deletion planning and execution of the expired volume backups"""
+
+from __future__ import annotations
+
+import collections
+import time
+
+import futurist
+from oslo_log import log
+from oslo_utils import timeutils
+
+import staffeln.conf
+from staffeln.common import constants, ratelimit
+from staffeln.common import time as xtime
+
+CONF = staffeln.conf.CONF
+LOG = log.getLogger(__name__)
+
+
+class RetentionPolicy(object):
+    """A retention time compiled into its cutoff
+
+    The retention time is parsed once and the cutoff is computed from the
+    time of the rotation run, so that all the backups are compared to
+    the same cutoff.
+    """
+
+    def __init__(self, retention_time, now=None):
+        self.retention_time = retention_time
+        self.cutoff = None
+        time_delta_dict = xtime.parse_timedelta_string(retention_time)
+        if time_delta_dict is not None:
+            self.cutoff = xtime.timeago(
+                from_date=now or timeutils.utcnow(), **time_delta_dict
+            )
+
+    @property
+    def valid(self):
+        return self.cutoff is not None
+
+
+class RetentionPolicies(object):
+    """Retention policies of a rotation run, one per distinct string"""
+
+    def __init__(self, now=None):
+        self.now = now or timeutils.utcnow()
+        self._policies = {}
+
+    def get(self, retention_time):
+        policy = self._policies.get(retention_time)
+        if policy is None:
+            policy = RetentionPolicy(retention_time, now=self.now)
+            self._policies[retention_time] = policy
+        return policy
+
+    def get_cutoffs(self, retention_map):
+        """Map the instances with a valid retention time to its cutoff"""
+        cutoffs = {}
+        for instance_id, retention_time in retention_map.items():
+            policy = self.get(retention_time)
+            if policy.valid:
+                cutoffs[instance_id] = policy.cutoff
+        return cutoffs
+
+
+def batch_expired_backups(expired_backups, batch_size):
+    """Group the expired backups in batches of whole instances
+
+    The expired backups come ordered by instance, and a batch is only
+    closed between two instances, so all the expired backups of a volume
+    are planned together.
+
+    :param expired_backups: the expired backups, ordered by instance
+    :param batch_size: the number of backups after which a batch is closed
+    :returns: generator of lists of expired backups
+    """
+    batch = []
+    for backup in expired_backups:
+        if len(batch) >= batch_size and backup.instance_id != batch[-1].instance_id:
+            yield batch
+            batch = []
+        batch.append(backup)
+    if batch:
+        yield batch
+
+
+def build_dependents(backups):
+    """Map each backup to the backups depending on it
+
+    Backups of a volume form chains: an incremental backup depends on
+    the previous completed backup of the same volume, and a full backup
+    starts a new chain. Records of failed backups (backup_completed=0)
+    are standalone.
+
+    :param backups: all the backups of a set of volumes
+    :returns: dict mapping backup_id to the list of its dependents
+    """
+    by_volume = collections.defaultdict(list)
+    for backup in backups:
+        if backup.backup_completed:
+            by_volume[backup.volume_id].append(backup)
+
+    dependents = collections.defaultdict(list)
+    for volume_backups in by_volume.values():
+        volume_backups.sort(key=lambda backup: (backup.created_at, backup.id))
+        parent = None
+        for backup in volume_backups:
+            if backup.incremental and parent is not None:
+                dependents[parent.backup_id].append(backup)
+            parent = backup
+    return dependents
+
+
+def plan_deletions(expired_backups, dependents):
+    """Order the expired backups for deletion
+
+    A backup can be deleted when it is expired and all its dependents
+    can be deleted too. Dependents come before the backups they depend
+    on, so Cinder never refuses a deletion because incremental backups
+    exist, as long as the dependents are deleted first.
+
+    :param expired_backups: the expired backups
+    :param dependents: the dependents of the backups of the volumes of the
+                       expired backups, from build_dependents
+    :returns: the backups to delete in deletion order, and the expired
+              backups kept because of live dependents
+    """
+    expired = {backup.backup_id: backup for backup in expired_backups}
+    newest_first = sorted(
+        expired.values(),
+        key=lambda backup: (backup.created_at, backup.id),
+        reverse=True,
+    )
+
+    # Dependents are always newer than the backup they depend on, so
+    # walking the backups from the newest gives a valid deletion order.
+    deletable = {}
+    deletions = []
+    skipped = []
+    for backup in newest_first:
+        if all(
+            deletable.get(dependent.backup_id, False)
+            for dependent in dependents.get(backup.backup_id, [])
+        ):
+            deletable[backup.backup_id] = True
+            deletions.append(backup)
+        else:
+            skipped.append(backup)
+    return deletions, skipped
+
+
+class DeletionPipeline(object):
+    """Delete backups with a bounded window of in-flight deletions
+
+    Deletions are requested concurrently, paced at deletion_rate per
+    second, with at most deletion_window backups being deleted by Cinder
+    at the same time. A backup is only requested once all its dependents
+    are gone from Cinder. Deletions still in progress when the pipeline
+    times out are tracked in the database and resumed by the next run.
+    """
+
+    def __init__(self, controller):
+        self.controller = controller
+        self.bucket = ratelimit.TokenBucket()
+
+    def run(self, deletions, dependents, in_flight=(), timeout=None):
+        """Delete backups and wait for Cinder to remove them
+
+        :param deletions: the backups to delete, from plan_deletions
+        :param dependents: the dependents of the backups
+        :param in_flight: backups whose deletion was requested before
+        :param timeout: seconds after which the run stops waiting
+        :returns: the number of backups removed
+        """
+        parents = {}
+        remaining = {}
+        for backup in deletions:
+            children = dependents.get(backup.backup_id, [])
+            remaining[backup.backup_id] = len(children)
+            for child in children:
+                parents[child.backup_id] = backup
+        in_flight = {backup.backup_id: backup for backup in in_flight}
+        ready = collections.deque(
+            backup
+            for backup in deletions
+            if not remaining[backup.backup_id] and backup.backup_id not in in_flight
+        )
+        deadline = None if timeout is None else time.monotonic() + timeout
+        removed = 0
+
+        with futurist.ThreadPoolExecutor(
+            max_workers=CONF.conductor.deletion_workers
+        ) as executor:
+            while ready or in_flight:
+                if deadline is not None and time.monotonic() >= deadline:
+                    LOG.info(
+                        f"{len(in_flight)} backup deletions are still in "
+                        "progress, they will be checked in the next cycle."
+                    )
+                    break
+                futures = [
+                    (
+                        backup,
+                        executor.submit(self.controller.check_backup_deletion, backup),
+                    )
+                    for backup in in_flight.values()
+                ]
+                requested = len(in_flight)
+                while ready and requested < CONF.conductor.deletion_window:
+                    self._pace()
+                    backup = ready.popleft()
+                    futures.append(
+                        (
+                            backup,
+                            executor.submit(
+                                self.controller.request_backup_deletion, backup
+                            ),
+                        )
+                    )
+                    requested += 1
+
+                for backup, future in futures:
+                    try:
+                        state = future.result()
+                    except Exception as ex:  # pylint: disable=W0703
+                        LOG.warn(f"Deletion of backup {backup.backup_id} failed. {ex}")
+                        state = constants.DELETION_FAILED
+                    if state == constants.DELETION_IN_PROGRESS:
+                        in_flight[backup.backup_id] = backup
+                        continue
+                    in_flight.pop(backup.backup_id, None)
+                    if state != constants.DELETION_DONE:
+                        continue
+                    removed += 1
+                    parent = parents.get(backup.backup_id)
+                    if parent is not None:
+                        remaining[parent.backup_id] -= 1
+                        if not remaining[parent.backup_id]:
+                            ready.append(parent)
+                if in_flight:
+                    time.sleep(CONF.conductor.deletion_poll_interval)
+        return removed
+
+    def _pace(self):
+        rate = CONF.conductor.deletion_rate
+        if rate <= 0:
+            return
+        while True:
+            wait = self.bucket.consume(rate, 1)
+            if not wait:
+                return
+            time.sleep(wait)
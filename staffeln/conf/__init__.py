@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from oslo_config import cfg
 
-from staffeln.conf import api, conductor, database, notify, paths
+from staffeln.conf import api, conductor, database, notify, openstack, paths
 
 CONF = cfg.CONF
 
@@ -10,4 +10,5 @@ api.register_opts(CONF)
 conductor.register_opts(CONF)
 database.register_opts(CONF)
 notify.register_opts(CONF)
+openstack.register_opts(CONF)
 paths.register_opts(CONF)
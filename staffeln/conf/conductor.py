@@ -72,6 +72,131 @@ backup_opts = [
         min=0,
         help=_("Number of incremental backups between full backups."),
     ),
+    cfg.IntOpt(
+        "backup_throughput",
+        default=100,
+        min=1,
+        help=_(
+            "The initial estimation of backup throughput in MiB per second, "
+            "used to decide when to check the status of a backup. It is "
+            "refined with the throughput of the backups observed since."
+        ),
+    ),
+    cfg.IntOpt(
+        "wip_poll_min_interval",
+        default=10,
+        min=1,
+        help=_(
+            "The minimum interval between two status checks of a backup in "
+            "progress, the unit is one second."
+        ),
+    ),
+    cfg.IntOpt(
+        "wip_poll_max_interval",
+        default=600,
+        min=1,
+        help=_(
+            "The maximum interval between two status checks of a backup in "
+            "progress, the unit is one second."
+        ),
+    ),
+    cfg.BoolOpt(
+        "backup_notifications_enabled",
+        default=False,
+        help=_(
+            "Consume Cinder backup.create.end and backup.create.error "
+            "notifications to complete backup tasks as soon as Cinder "
+            "reports them. Status polling is then only done every "
+            "wip_poll_max_interval seconds as a safety net."
+        ),
+    ),
+    cfg.ListOpt(
+        "backup_notification_topics",
+        default=["notifications"],
+        help=_("The topics to consume Cinder backup notifications from."),
+    ),
+    cfg.StrOpt(
+        "backup_notification_pool",
+        default="staffeln",
+        help=_(
+            "The listener pool name, so that Staffeln receives its own copy "
+            "of the notifications consumed by other services."
+        ),
+    ),
+    cfg.IntOpt(
+        "backup_dispatch_period",
+        default=60,
+        min=1,
+        help=_(
+            "The interval at which backup workers claim planned backup tasks "
+            "and create their backups, the unit is one second."
+        ),
+    ),
+    cfg.IntOpt(
+        "task_claim_batch_size",
+        default=20,
+        min=1,
+        help=_(
+            "The number of planned backup tasks a backup worker claims "
+            "from the queue at once."
+        ),
+    ),
+    cfg.IntOpt(
+        "backup_dispatch_workers",
+        default=1,
+        min=1,
+        help=_(
+            "The number of threads used to create volume backups "
+            "concurrently. The default processes backup tasks one by one."
+        ),
+    ),
+    cfg.IntOpt(
+        "backup_dispatch_max_per_project",
+        default=0,
+        min=0,
+        help=_(
+            "The maximum number of volume backups being created at the same "
+            "time in a single project by one backup worker. 0 means no limit."
+        ),
+    ),
+    cfg.IntOpt(
+        "backup_dispatch_max_per_az",
+        default=0,
+        min=0,
+        help=_(
+            "The maximum number of volume backups being created at the same "
+            "time in a single availability zone by one backup worker, so "
+            "that no cinder-backup backend is overloaded. 0 means no limit."
+        ),
+    ),
+    cfg.IntOpt(
+        "discovery_workers",
+        default=1,
+        min=1,
+        help=_(
+            "The number of threads used to check the servers and volumes "
+            "of projects concurrently while discovering backup candidates."
+        ),
+    ),
+    cfg.IntOpt(
+        "queue_write_batch_size",
+        default=100,
+        min=1,
+        help=_(
+            "The number of discovered backup tasks written to the queue at "
+            "once. Tasks are written while discovery is still running, so "
+            "backup workers can start on them early."
+        ),
+    ),
+    cfg.BoolOpt(
+        "discovery_all_projects_sweep",
+        default=False,
+        help=_(
+            "List servers of all projects in a single paginated sweep and "
+            "group them by project while discovering backup candidates, "
+            "instead of listing servers project by project."
+        ),
+    ),
 ]
 
 rotation_opts = [
@@ -110,6 +235,51 @@ rotation_opts = [
             "<YEARS>y<MONTHS>mon<WEEKS>w<DAYS>d<HOURS>h<MINUTES>min<SECONDS>s."
         ),
     ),
+    cfg.IntOpt(
+        "deletion_window",
+        default=20,
+        min=1,
+        help=_(
+            "The maximum number of backups being deleted by Cinder at the "
+            "same time for the retention service."
+        ),
+    ),
+    cfg.FloatOpt(
+        "deletion_rate",
+        default=1.0,
+        min=0,
+        help=_(
+            "The maximum number of backup deletions requested per second by "
+            "the retention service. 0 means no limit."
+        ),
+    ),
+    cfg.IntOpt(
+        "deletion_workers",
+        default=4,
+        min=1,
+        help=_(
+            "The number of threads used to request and check backup "
+            "deletions concurrently."
+        ),
+    ),
+    cfg.IntOpt(
+        "deletion_poll_interval",
+        default=10,
+        min=1,
+        help=_(
+            "The interval in seconds between two checks of the backups "
+            "being deleted by Cinder."
+        ),
+    ),
+    cfg.IntOpt(
+        "retention_page_size",
+        default=500,
+        min=1,
+        help=_(
+            "The number of expired backups fetched from the database at once "
+            "by the retention service."
+        ),
+    ),
 ]
 
 
@@ -128,6 +298,17 @@ coordination_opts = [
         default="",
         help=_("lock coordination connection backend URL."),
     ),
+    cfg.IntOpt(
+        "health_check_interval",
+        default=30,
+        min=0,
+        help=_(
+            "The minimum interval between two health checks of the "
+            "connection to the coordination backend, which is reconnected "
+            "when found broken. 0 checks it on every use. The unit is one "
+            "second."
+        ),
+    ),
 ]
 
 
@@ -54,6 +54,17 @@ email_opts = [
         default="25",
         help=_("the port to which to connect"),
     ),
+    cfg.IntOpt(
+        "member_email_prefetch_threshold",
+        default=20,
+        min=0,
+        help=_(
+            "When the reports of at least this number of projects are sent "
+            "to project members, the emails of all users are fetched with a "
+            "single listing instead of one lookup per member. 0 disables "
+            "the prefetch."
+        ),
+    ),
 ]
 
 
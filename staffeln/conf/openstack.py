@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+from oslo_config import cfg
+
+from staffeln.i18n import _
+
+openstack_group = cfg.OptGroup(
+    "openstack",
+    title="OpenStack API options",
+    help=_("Options under this group are used to define OpenStack API access."),
+)
+
+rate_limit_opts = [
+    cfg.FloatOpt(
+        "compute_rate_limit",
+        default=0,
+        min=0,
+        help=_(
+            "The maximum number of Compute API requests per second issued "
+            "by all Staffeln workers. 0 means no limit."
+        ),
+    ),
+    cfg.FloatOpt(
+        "block_storage_rate_limit",
+        default=0,
+        min=0,
+        help=_(
+            "The maximum number of Block Storage API requests per second "
+            "issued by all Staffeln workers. 0 means no limit."
+        ),
+    ),
+    cfg.FloatOpt(
+        "identity_rate_limit",
+        default=0,
+        min=0,
+        help=_(
+            "The maximum number of Identity API requests per second issued "
+            "by all Staffeln workers. 0 means no limit."
+        ),
+    ),
+    cfg.IntOpt(
+        "rate_limit_burst",
+        default=10,
+        min=1,
+        help=_(
+            "The number of requests to a service that can be issued at once "
+            "before the rate limit applies."
+        ),
+    ),
+    cfg.IntOpt(
+        "list_page_size",
+        default=1000,
+        min=1,
+        help=_(
+            "The number of resources requested per page when listing "
+            "servers, volumes and backups. Each page counts as one request "
+            "for the rate limits."
+        ),
+    ),
+]
+
+connection_opts = [
+    cfg.IntOpt(
+        "connection_cache_size",
+        default=256,
+        min=1,
+        help=_(
+            "The maximum number of project scoped connections kept by a "
+            "worker process. The least recently used ones are closed first."
+        ),
+    ),
+    cfg.IntOpt(
+        "connection_token_stale_duration",
+        default=300,
+        min=0,
+        help=_(
+            "A cached project connection is replaced when its token expires "
+            "within this number of seconds."
+        ),
+    ),
+]
+
+scope_opts = [
+    cfg.BoolOpt(
+        "admin_scope_backups",
+        default=False,
+        help=_(
+            "Get, list and delete volume backups of all projects with the "
+            "connection of the Staffeln service user instead of a project "
+            "scoped connection per project, so that no token is issued per "
+            "project for these calls. This requires the service user to be "
+            "allowed to manage the backups of all projects. Backups are "
+            "still created with a project scoped connection, because Cinder "
+            "assigns the backup to the project of the token."
+        ),
+    ),
+]
+
+quota_opts = [
+    cfg.IntOpt(
+        "quota_cache_ttl",
+        default=300,
+        min=0,
+        help=_("The number of seconds the volume quotas of a project are cached."),
+    ),
+    cfg.IntOpt(
+        "quota_workers",
+        default=8,
+        min=1,
+        help=_("The number of threads used to get the quotas of projects."),
+    ),
+]
+
+identity_opts = [
+    cfg.IntOpt(
+        "identity_cache_ttl",
+        default=600,
+        min=0,
+        help=_(
+            "The number of seconds the project members and user emails "
+            "used for the backup reports are cached."
+        ),
+    ),
+]
+
+
+def register_opts(conf):
+    conf.register_group(openstack_group)
+    conf.register_opts(rate_limit_opts, group=openstack_group)
+    conf.register_opts(connection_opts, group=openstack_group)
+    conf.register_opts(scope_opts, group=openstack_group)
+    conf.register_opts(quota_opts, group=openstack_group)
+    conf.register_opts(identity_opts, group=openstack_group)
+
+
+def list_opts():
+    return {
+        openstack_group: (
+            rate_limit_opts + connection_opts + scope_opts + quota_opts + identity_opts
+        ),
+    }
@@ -0,0 +1,28 @@
+"""Add volume_size and next_check_at columns to queue_data table
+
+Revision ID: 7d1f3c2a9e84
+Revises: c3e5e0b4b1f2
+Create Date: 2026-10-17 11:25:02.604871
+
+"""
+
+# revision identifiers, used by Alembic.
+from __future__ import annotations
+
+revision = "7d1f3c2a9e84"
+down_revision = "c3e5e0b4b1f2"
+
+import sqlalchemy as sa  # noqa: E402
+from alembic import op  # noqa: E402
+
+
+def upgrade():
+    op.add_column("queue_data", sa.Column("volume_size", sa.Integer(), nullable=True))
+    op.add_column(
+        "queue_data", sa.Column("next_check_at", sa.DateTime(), nullable=True)
+    )
+
+
+def downgrade():
+    op.drop_column("queue_data", "next_check_at")
+    op.drop_column("queue_data", "volume_size")
@@ -0,0 +1,39 @@
+"""Add indexes on queue_data and backup_data filter columns
+
+Revision ID: a0d35d64b324
+Revises: 5b2e78435231
+Create Date: 2026-10-17 09:12:31.402518
+
+"""
+
+# revision identifiers, used by Alembic.
+from __future__ import annotations
+
+revision = "a0d35d64b324"
+down_revision = "5b2e78435231"
+
+from alembic import op  # noqa: E402
+
+
+def upgrade():
+    op.create_index(
+        "queue_data_backup_status_project_id_idx",
+        "queue_data",
+        ["backup_status", "project_id"],
+    )
+    op.create_index(
+        "backup_data_volume_id_created_at_idx",
+        "backup_data",
+        ["volume_id", "created_at"],
+    )
+    op.create_index(
+        "backup_data_instance_id_idx",
+        "backup_data",
+        ["instance_id"],
+    )
+
+
+def downgrade():
+    op.drop_index("backup_data_instance_id_idx", table_name="backup_data")
+    op.drop_index("backup_data_volume_id_created_at_idx", table_name="backup_data")
+    op.drop_index("queue_data_backup_status_project_id_idx", table_name="queue_data")
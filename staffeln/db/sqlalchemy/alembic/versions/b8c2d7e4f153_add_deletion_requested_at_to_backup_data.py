@@ -0,0 +1,27 @@
+"""Add deletion_requested_at column to backup_data table
+
+Revision ID: b8c2d7e4f153
+Revises: e5a9c4f61b37
+Create Date: 2026-10-17 16:48:13.902744
+
+"""
+
+# revision identifiers, used by Alembic.
+from __future__ import annotations
+
+revision = "b8c2d7e4f153"
+down_revision = "e5a9c4f61b37"
+
+import sqlalchemy as sa  # noqa: E402
+from alembic import op  # noqa: E402
+
+
+def upgrade():
+    op.add_column(
+        "backup_data",
+        sa.Column("deletion_requested_at", sa.DateTime(), nullable=True),
+    )
+
+
+def downgrade():
+    op.drop_column("backup_data", "deletion_requested_at")
@@ -0,0 +1,26 @@
+"""Add claimed_by column to queue_data table
+
+Revision ID: c3e5e0b4b1f2
+Revises: a0d35d64b324
+Create Date: 2026-10-17 10:03:47.118263
+
+"""
+
+# revision identifiers, used by Alembic.
+from __future__ import annotations
+
+revision = "c3e5e0b4b1f2"
+down_revision = "a0d35d64b324"
+
+import sqlalchemy as sa  # noqa: E402
+from alembic import op  # noqa: E402
+
+
+def upgrade():
+    op.add_column(
+        "queue_data", sa.Column("claimed_by", sa.String(length=255), nullable=True)
+    )
+
+
+def downgrade():
+    op.drop_column("queue_data", "claimed_by")
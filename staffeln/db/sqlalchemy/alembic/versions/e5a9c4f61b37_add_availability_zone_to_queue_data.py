@@ -0,0 +1,27 @@
+"""Add availability_zone column to queue_data table
+
+Revision ID: e5a9c4f61b37
+Revises: 7d1f3c2a9e84
+Create Date: 2026-10-17 14:02:41.318250
+
+"""
+
+# revision identifiers, used by Alembic.
+from __future__ import annotations
+
+revision = "e5a9c4f61b37"
+down_revision = "7d1f3c2a9e84"
+
+import sqlalchemy as sa  # noqa: E402
+from alembic import op  # noqa: E402
+
+
+def upgrade():
+    op.add_column(
+        "queue_data",
+        sa.Column("availability_zone", sa.String(length=255), nullable=True),
+    )
+
+
+def downgrade():
+    op.drop_column("queue_data", "availability_zone")
@@ -0,0 +1,27 @@
+"""Add started_at column to queue_data table
+
+Revision ID: f2d41a7c9e06
+Revises: b8c2d7e4f153
+Create Date: 2026-10-17 19:12:41.530418
+
+"""
+
+# revision identifiers, used by Alembic.
+from __future__ import annotations
+
+revision = "f2d41a7c9e06"
+down_revision = "b8c2d7e4f153"
+
+import sqlalchemy as sa  # noqa: E402
+from alembic import op  # noqa: E402
+
+
+def upgrade():
+    op.add_column(
+        "queue_data",
+        sa.Column("started_at", sa.DateTime(), nullable=True),
+    )
+
+
+def downgrade():
+    op.drop_column("queue_data", "started_at")
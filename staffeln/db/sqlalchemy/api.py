@@ -11,10 +11,11 @@ from oslo_db.sqlalchemy import session as db_session
 from oslo_db.sqlalchemy import utils as db_utils
 from oslo_log import log
 from oslo_utils import strutils, timeutils, uuidutils
+from sqlalchemy import and_, func, or_
 from sqlalchemy.inspection import inspect
 from sqlalchemy.orm import exc
 
-from staffeln.common import short_id
+from staffeln.common import constants, short_id
 from staffeln.db.sqlalchemy import models
 
 LOG = log.getLogger(__name__)
@@ -26,6 +27,11 @@ _FACADE = None
 is_uuid_like = uuidutils.is_uuid_like
 is_int_like = strutils.is_int_like
 
+# Maximum number of values bound in a single IN clause.
+MAX_IN_CLAUSE_SIZE = 500
+# Maximum number of rows inserted by a single multi-row INSERT.
+MAX_BULK_INSERT_SIZE = 1000
+
 
 def _create_facade_lazily():
     global _FACADE
@@ -133,6 +139,7 @@ class Connection(object):
             "backup_completed",
             "instance_id",
             "created_at",
+            "deletion_requested_at",
         ]
 
         return self._add_filters(
@@ -287,6 +294,141 @@ class Connection(object):
             models.Backup_data, self._add_backup_filters, *args, **kwargs
         )
 
+    def get_backup_history(self, volume_ids, depth=0):
+        """Get the backup history of a set of volumes in a few queries
+
+        :param volume_ids: The volumes to get the backup history for
+        :param depth: Number of latest incremental flags to return
+                      per volume
+        :returns: dict mapping volume_id to a dict with the latest
+                  backup creation time as "last_created_at" and the
+                  incremental flags of the latest `depth` backups,
+                  newest first, as "incremental". Volumes without
+                  backup are not included.
+        """
+        history = {}
+        volume_ids = list(set(volume_ids))
+        for start in range(0, len(volume_ids), MAX_IN_CLAUSE_SIZE):
+            end = start + MAX_IN_CLAUSE_SIZE
+            chunk = volume_ids[start:end]
+            query = model_query(
+                models.Backup_data.volume_id,
+                func.max(models.Backup_data.created_at),
+            )
+            query = query.filter(models.Backup_data.volume_id.in_(chunk))
+            query = query.group_by(models.Backup_data.volume_id)
+            for volume_id, last_created_at in query.all():
+                history[volume_id] = {
+                    "last_created_at": last_created_at,
+                    "incremental": [],
+                }
+
+            if not depth:
+                continue
+            row_number = (
+                func.row_number()
+                .over(
+                    partition_by=models.Backup_data.volume_id,
+                    order_by=models.Backup_data.id.desc(),
+                )
+                .label("row_number")
+            )
+            subquery = (
+                model_query(
+                    models.Backup_data.volume_id,
+                    models.Backup_data.incremental,
+                    row_number,
+                )
+                .filter(models.Backup_data.volume_id.in_(chunk))
+                .subquery()
+            )
+            query = (
+                model_query(subquery.c.volume_id, subquery.c.incremental)
+                .filter(subquery.c.row_number <= depth)
+                .order_by(subquery.c.volume_id, subquery.c.row_number)
+            )
+            for volume_id, incremental in query.all():
+                history[volume_id]["incremental"].append(incremental)
+        return history
+
+    def get_volumes_backup_list(self, volume_ids):
+        """Get all the backups of a set of volumes
+
+        :param volume_ids: The volumes to get the backups for
+        :returns: list of backups ordered by volume and creation time
+        """
+        backups = []
+        volume_ids = sorted(set(volume_ids))
+        for start in range(0, len(volume_ids), MAX_IN_CLAUSE_SIZE):
+            end = start + MAX_IN_CLAUSE_SIZE
+            query = model_query(models.Backup_data).filter(
+                models.Backup_data.volume_id.in_(volume_ids[start:end])
+            )
+            query = query.order_by(
+                models.Backup_data.volume_id,
+                models.Backup_data.created_at,
+                models.Backup_data.id,
+            )
+            backups.extend(query.all())
+        return backups
+
+    def get_expired_backup_list(
+        self, default_cutoff=None, instance_cutoffs=None, limit=None, marker=None
+    ):
+        """Get a page of the backups older than their retention cutoff
+
+        The backups of the instances in instance_cutoffs expire at the
+        cutoff of their instance, the backups of the other instances at
+        the default cutoff. Backups are ordered by instance, newest first,
+        so pages can be fetched by passing the last backup of the previous
+        page as marker.
+
+        :param default_cutoff: Backups created before are expired, None
+                               to keep the backups of other instances.
+        :param instance_cutoffs: dict mapping instance_id to its cutoff.
+        :param limit: Maximum number of backups to return.
+        :param marker: The last backup of the previous page.
+        :returns: list of expired backups
+        """
+        model = models.Backup_data
+        instance_cutoffs = instance_cutoffs or {}
+        instances_by_cutoff = {}
+        for instance_id, cutoff in instance_cutoffs.items():
+            instances_by_cutoff.setdefault(cutoff, []).append(instance_id)
+
+        conditions = []
+        for cutoff, instance_ids in instances_by_cutoff.items():
+            for start in range(0, len(instance_ids), MAX_IN_CLAUSE_SIZE):
+                end = start + MAX_IN_CLAUSE_SIZE
+                conditions.append(
+                    and_(
+                        model.instance_id.in_(instance_ids[start:end]),
+                        model.created_at < cutoff,
+                    )
+                )
+        if default_cutoff is not None:
+            default_conditions = [model.created_at < default_cutoff]
+            instance_ids = list(instance_cutoffs)
+            for start in range(0, len(instance_ids), MAX_IN_CLAUSE_SIZE):
+                end = start + MAX_IN_CLAUSE_SIZE
+                default_conditions.append(
+                    model.instance_id.notin_(instance_ids[start:end])
+                )
+            conditions.append(and_(*default_conditions))
+        if not conditions:
+            return []
+
+        query = model_query(model).filter(or_(*conditions))
+        query = db_utils.paginate_query(
+            query,
+            model,
+            limit,
+            ["instance_id", "created_at", "id"],
+            marker=marker,
+            sort_dirs=["asc", "desc", "desc"],
+        )
+        return query.all()
+
     def update_backup(self, backup_id, values):
         if "backup_id" in values:
             LOG.error("Cannot override ID for existing backup")
@@ -306,6 +448,35 @@ class Connection(object):
             LOG.error("Backup ID already exists.")
         return queue_data
 
+    def create_queue_bulk(self, values_list):
+        """Create queue_data rows in batched multi-row INSERTs
+
+        All rows are inserted within one transaction. Every values dict is
+        expected to carry the same columns.
+
+        :param values_list: list of column values, one dict per row
+        :returns: the number of rows inserted
+        """
+        if not values_list:
+            return 0
+        now = timeutils.utcnow()
+        rows = []
+        for values in values_list:
+            values = dict(values)
+            if not values.get("backup_id"):
+                values["backup_id"] = short_id.generate_id()
+            values.setdefault("created_at", now)
+            rows.append(values)
+
+        session = get_session()
+        with session.begin():
+            for start in range(0, len(rows), MAX_BULK_INSERT_SIZE):
+                end = start + MAX_BULK_INSERT_SIZE
+                session.execute(
+                    models.Queue_data.__table__.insert().values(rows[start:end])
+                )
+        return len(rows)
+
     def get_queue_list(self, *args, **kwargs):
         return self._get_model_list(
             models.Queue_data, self._add_queues_filters, *args, **kwargs
@@ -318,10 +489,113 @@ class Connection(object):
         except Exception:  # noqa: E722
             LOG.error("Queue resource not found.")
 
+    def claim_tasks(
+        self, status, limit, worker_id, claimed_status=None, project_ids=None
+    ):
+        """Atomically move a batch of queue_data rows to a claimed status
+
+        On MySQL and PostgreSQL the candidate rows are locked with
+        SELECT ... FOR UPDATE SKIP LOCKED, so that concurrent workers
+        claim disjoint batches without waiting on each other. Other
+        backends rely on a compare-and-swap UPDATE that only moves rows
+        still in `status`. When another worker wins the race for all the
+        candidates, new candidates are selected until a batch is claimed
+        or no row is left in `status`.
+
+        :param status: The backup status of the rows to claim
+        :param limit: The maximum number of rows to claim
+        :param worker_id: The identifier of the claiming worker
+        :param claimed_status: The backup status of claimed rows,
+                               BACKUP_INIT by default. The claim time is
+                               recorded as started_at.
+        :param project_ids: Only claim rows of these projects if given
+        :returns: the claimed rows
+        """
+        if claimed_status is None:
+            claimed_status = constants.BACKUP_INIT
+        while True:
+            claimed = self._claim_tasks(
+                status, limit, worker_id, claimed_status, project_ids
+            )
+            # None means no candidate is left
+            if claimed is None:
+                return []
+            if claimed:
+                return claimed
+
+    def _claim_tasks(self, status, limit, worker_id, claimed_status, project_ids):
+        """Claim one batch of candidates, None if there is no candidate"""
+        model = models.Queue_data
+        session = get_session()
+        with session.begin():
+            query = model_query(model.id, session=session)
+            query = query.filter(model.backup_status == status)
+            if project_ids is not None:
+                query = query.filter(model.project_id.in_(project_ids))
+            query = query.order_by(model.id).limit(limit)
+            if get_engine().dialect.name in ("mysql", "postgresql"):
+                query = query.with_for_update(skip_locked=True)
+            ids = [row.id for row in query.all()]
+            if not ids:
+                return None
+
+            now = timeutils.utcnow()
+            query = model_query(model, session=session)
+            query = query.filter(model.id.in_(ids), model.backup_status == status)
+            query.update(
+                {
+                    model.backup_status: claimed_status,
+                    model.claimed_by: worker_id,
+                    model.started_at: now,
+                    model.updated_at: now,
+                },
+                synchronize_session=False,
+            )
+
+            query = model_query(model, session=session)
+            query = query.filter(
+                model.id.in_(ids),
+                model.backup_status == claimed_status,
+                model.claimed_by == worker_id,
+            )
+            claimed = query.order_by(model.id).all()
+        return claimed
+
+    def get_queue_project_ids(self, backup_status):
+        """Get the distinct projects of the queue_data rows in a status
+
+        :param backup_status: The backup status of the rows
+        :returns: a set of project ids
+        """
+        query = model_query(models.Queue_data.project_id).distinct()
+        query = query.filter(models.Queue_data.backup_status == backup_status)
+        return {row.project_id for row in query.all()}
+
+    def purge_queues(self, project_id, backup_statuses):
+        """Delete the queue_data rows of a project in given statuses
+
+        :param project_id: The project to purge the queue for
+        :param backup_statuses: The backup statuses of rows to delete
+        :returns: the number of rows removed
+        """
+        session = get_session()
+        with session.begin():
+            query = model_query(models.Queue_data, session=session)
+            query = query.filter(
+                models.Queue_data.project_id == project_id,
+                models.Queue_data.backup_status.in_(backup_statuses),
+            )
+            count = query.delete(synchronize_session=False)
+        return count
+
     def get_queue_by_id(self, context, id):
         """Get the column from queue_data with matching id"""
         return self._get_queue(context, fieldname="id", value=id)
 
+    def get_queue_by_backup_id(self, context, backup_id):
+        """Get the column from queue_data with matching backup_id"""
+        return self._get_queue(context, fieldname="backup_id", value=backup_id)
+
     def _get_queue(self, context, fieldname, value):
         """Get the columns from queue_data table"""
 
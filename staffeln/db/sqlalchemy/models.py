@@ -7,8 +7,9 @@ from __future__ import annotations
 import urllib.parse as urlparse
 
 from oslo_db.sqlalchemy import models
-from sqlalchemy import Boolean, Column, Integer, String, UniqueConstraint
+from sqlalchemy import Boolean, Column, DateTime, Integer, String
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.schema import Index, UniqueConstraint
 
 from staffeln import conf
 
@@ -52,6 +53,8 @@ class Backup_data(Base):
     __tablename__ = "backup_data"
     __table_args__ = (
         UniqueConstraint("backup_id", name="unique_backup0uuid"),
+        Index("backup_data_volume_id_created_at_idx", "volume_id", "created_at"),
+        Index("backup_data_instance_id_idx", "instance_id"),
         table_args(),
     )
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -61,13 +64,21 @@ class Backup_data(Base):
     instance_id = Column(String(100))
     backup_completed = Column(Integer())
     incremental = Column(Boolean, default=False)
+    deletion_requested_at = Column(DateTime, nullable=True)
 
 
 class Queue_data(Base):
     """Represent the queue of the database"""
 
     __tablename__ = "queue_data"
-    __table_args__ = table_args()
+    __table_args__ = (
+        Index(
+            "queue_data_backup_status_project_id_idx",
+            "backup_status",
+            "project_id",
+        ),
+        table_args(),
+    )
     id = Column(Integer, primary_key=True, autoincrement=True)
     backup_id = Column(String(100))
     project_id = Column(String(100))
@@ -78,6 +89,11 @@ class Queue_data(Base):
     instance_name = Column(String(100))
     incremental = Column(Boolean, default=False)
     reason = Column(String(255), nullable=True)
+    claimed_by = Column(String(255), nullable=True)
+    volume_size = Column(Integer(), nullable=True)
+    next_check_at = Column(DateTime, nullable=True)
+    availability_zone = Column(String(255), nullable=True)
+    started_at = Column(DateTime, nullable=True)
 
 
 class Report_timestamp(Base):
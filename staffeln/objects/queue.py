@@ -13,10 +13,14 @@ class Queue(
     base.StaffelnObject,
     base.StaffelnObjectDictCompat,
 ):
-    VERSION = "1.2"
+    VERSION = "1.6"
     # Version 1.0: Initial version
     # Version 1.1: Add 'incremental' and 'reason' field
     # Version 1.2: Add 'created_at' field
+    # Version 1.3: Add 'claimed_by' field
+    # Version 1.4: Add 'volume_size' and 'next_check_at' field
+    # Version 1.5: Add 'availability_zone' field
+    # Version 1.6: Add 'started_at' field
 
     dbapi = db_api.get_instance()
 
@@ -31,6 +35,11 @@ class Queue(
         "instance_name": sfeild.StringField(),
         "incremental": sfeild.BooleanField(),
         "reason": sfeild.StringField(nullable=True),
+        "claimed_by": sfeild.StringField(nullable=True),
+        "volume_size": sfeild.IntegerField(nullable=True),
+        "next_check_at": sfeild.DateTimeField(nullable=True),
+        "availability_zone": sfeild.StringField(nullable=True),
+        "started_at": sfeild.DateTimeField(nullable=True),
         "created_at": ovoo_fields.DateTimeField(),
     }
 
@@ -39,6 +48,24 @@ class Queue(
         db_queue = cls.dbapi.get_queue_list(context, filters=filters)
         return [cls._from_db_object(cls(context), obj) for obj in db_queue]
 
+    @base.remotable_classmethod
+    def claim(
+        cls, context, backup_status, limit, worker_id, project_ids=None
+    ):  # pylint: disable=E0213
+        """Atomically claim a batch of queue tasks for a worker
+
+        :param context: Security context.
+        :param backup_status: the backup status of the tasks to claim.
+        :param limit: the maximum number of tasks to claim.
+        :param worker_id: the identifier of the claiming worker.
+        :param project_ids: only claim tasks of these projects if given.
+        :returns: a list of claimed :class:`Queue` objects.
+        """
+        db_queue = cls.dbapi.claim_tasks(
+            backup_status, limit, worker_id, project_ids=project_ids
+        )
+        return [cls._from_db_object(cls(context), obj) for obj in db_queue]
+
     @base.remotable_classmethod
     def get_by_id(cls, context, id):  # pylint: disable=E0213
         """Find a queue task based on id
@@ -57,6 +84,19 @@ class Queue(
         queue = cls._from_db_object(cls(context), db_queue)
         return queue
 
+    @base.remotable_classmethod
+    def get_by_backup_id(cls, context, backup_id):  # pylint: disable=E0213
+        """Find a queue task based on backup_id
+
+        :param context: Security context.
+        :param backup_id: the backup id of volume in queue.
+        :returns: a :class:`Queue` object, or None if not found.
+        """
+        db_queue = cls.dbapi.get_queue_by_backup_id(context, backup_id)
+        if db_queue is None:
+            return db_queue
+        return cls._from_db_object(cls(context), db_queue)
+
     @base.remotable
     def create(self):
         """Create a :class:`Backup_data` record in the DB"""
@@ -65,6 +105,37 @@ class Queue(
         db_queue = self.dbapi.create_queue(values)
         return self._from_db_object(self, db_queue)
 
+    @base.remotable_classmethod
+    def create_bulk(cls, context, queues):  # pylint: disable=E0213
+        """Create many :class:`Queue_data` records in the DB at once
+
+        :param context: Security context.
+        :param queues: list of dicts mapping the fields to their values.
+        :returns: the number of created records.
+        """
+        return cls.dbapi.create_queue_bulk(queues)
+
+    @base.remotable_classmethod
+    def list_project_ids(cls, context, backup_status):  # pylint: disable=E0213
+        """Return the projects having queue tasks in a status
+
+        :param context: Security context.
+        :param backup_status: the backup status of the tasks.
+        :returns: a set of project ids.
+        """
+        return cls.dbapi.get_queue_project_ids(backup_status)
+
+    @base.remotable_classmethod
+    def purge(cls, context, project_id, backup_statuses):  # pylint: disable=E0213
+        """Delete the queue tasks of a project in given statuses at once
+
+        :param context: Security context.
+        :param project_id: the project of the tasks.
+        :param backup_statuses: list of backup statuses of the tasks.
+        :returns: the number of deleted tasks.
+        """
+        return cls.dbapi.purge_queues(project_id, backup_statuses)
+
     @base.remotable
     def save(self):
         updates = self.obj_get_changes()
@@ -75,7 +146,7 @@ class Queue(
 
     @base.remotable
     def refresh(self):
-        current = self.get_by_backup_id(backup_id=self.backup_id)
+        current = self.get_by_backup_id(self._context, backup_id=self.backup_id)
         self.obj_refresh(current)
 
     @base.remotable
@@ -13,9 +13,10 @@ class Volume(
     base.StaffelnObject,
     base.StaffelnObjectDictCompat,
 ):
-    VERSION = "1.1"
+    VERSION = "1.2"
     # Version 1.0: Initial version
     # Version 1.1: Add 'incremental' and 'created_at' field
+    # Version 1.2: Add 'deletion_requested_at' field
 
     dbapi = db_api.get_instance()
 
@@ -27,6 +28,7 @@ class Volume(
         "volume_id": sfeild.UUIDField(),
         "backup_completed": sfeild.IntegerField(),
         "incremental": sfeild.BooleanField(nullable=True),
+        "deletion_requested_at": sfeild.DateTimeField(nullable=True),
         "created_at": ovoo_fields.DateTimeField(),
     }
 
@@ -40,6 +42,53 @@ class Volume(
 
         return [cls._from_db_object(cls(context), obj) for obj in db_backups]
 
+    @base.remotable_classmethod
+    def get_backup_history(cls, context, volume_ids, depth=0):  # pylint: disable=E0213
+        """Return the backup history of a set of volumes.
+
+        :param volume_ids: list of volume ids.
+        :param depth: number of latest incremental flags to return per volume.
+        :returns: dict mapping volume_id to its latest backup creation time
+                  and latest incremental flags.
+        """
+        return cls.dbapi.get_backup_history(volume_ids, depth=depth)
+
+    @base.remotable_classmethod
+    def list_by_volumes(cls, context, volume_ids):  # pylint: disable=E0213
+        """Return all the backups of a set of volumes.
+
+        :param volume_ids: list of volume ids.
+        :returns: a list of :class:`Volume` objects.
+        """
+        db_backups = cls.dbapi.get_volumes_backup_list(volume_ids)
+        return [cls._from_db_object(cls(context), obj) for obj in db_backups]
+
+    @base.remotable_classmethod
+    def list_expired(  # pylint: disable=E0213
+        cls,
+        context,
+        default_cutoff=None,
+        instance_cutoffs=None,
+        limit=None,
+        marker=None,
+    ):
+        """Return a page of the backups older than their retention cutoff.
+
+        :param default_cutoff: cutoff of the instances without their own.
+        :param instance_cutoffs: dict mapping instance_id to its cutoff.
+        :param limit: maximum number of backups to return.
+        :param marker: the last backup of the previous page.
+        :returns: a list of :class:`Volume` objects, newest first per
+                  instance.
+        """
+        db_backups = cls.dbapi.get_expired_backup_list(
+            default_cutoff=default_cutoff,
+            instance_cutoffs=instance_cutoffs,
+            limit=limit,
+            marker=marker,
+        )
+        return [cls._from_db_object(cls(context), obj) for obj in db_backups]
+
     @base.remotable
     def create(self):
         """Create a :class:`Backup_data` record in the DB"""
@@ -55,7 +104,7 @@ class Volume(
         of self.what_changed().
         """
         updates = self.obj_get_changes()
-        db_obj = self.dbapi.update_backup(self.uuid, updates)
+        db_obj = self.dbapi.update_backup(self.id, updates)
         obj = self._from_db_object(self, db_obj, eager=False)
         self.obj_refresh(obj)
         self.obj_reset_changes()
@@ -17,6 +17,19 @@ from __future__ import annotations
 
 from oslotest import base
 
+from staffeln.common import openstack
+
 
 class TestCase(base.BaseTestCase):
     """Test case base class for all unit tests."""
+
+    def setUp(self):
+        super(TestCase, self).setUp()
+        # The OpenStack caches live as long as the process
+        for openstack_cache in (
+            openstack.USER_EMAILS,
+            openstack.PROJECT_MEMBERS,
+            openstack.VOLUME_QUOTAS,
+        ):
+            openstack_cache.clear()
+            self.addCleanup(openstack_cache.clear)
@@ -0,0 +1,23 @@
+# SPDX-License-Identifier: Apache-2.0
+from __future__ import annotations
+
+from unittest import mock
+
+from staffeln.common import cache
+from staffeln.tests import base
+
+
+class TTLCacheTest(base.TestCase):
+
+    @mock.patch("time.monotonic")
+    def test_get_expired(self, m_monotonic):
+        m_monotonic.return_value = 100
+        ttl_cache = cache.TTLCache()
+        ttl_cache.set("foo", "bar", 10)
+        ttl_cache.set("none", None, 10)
+        self.assertEqual("bar", ttl_cache.get("foo"))
+        self.assertIn("none", ttl_cache)
+        m_monotonic.return_value = 110
+        self.assertIsNone(ttl_cache.get("foo"))
+        self.assertNotIn("none", ttl_cache)
+        self.assertEqual(0, len(ttl_cache))
@@ -0,0 +1,112 @@
+# SPDX-License-Identifier: Apache-2.0
+from __future__ import annotations
+
+from unittest import mock
+
+import fixtures
+from tooz import coordination
+
+from staffeln import conf
+from staffeln.common import lock
+from staffeln.tests import base
+
+
+class LockManagerTest(base.TestCase):
+
+    def setUp(self):
+        super(LockManagerTest, self).setUp()
+        self.lock_mgt = lock.LockManager()
+        self.lock_mgt.coordinator = mock.Mock()
+
+    def test_coordinator_kept_between_uses(self):
+        with self.lock_mgt:
+            pass
+        with self.lock_mgt:
+            pass
+        self.assertEqual(2, self.lock_mgt.coordinator.ensure_started.call_count)
+        self.lock_mgt.coordinator.stop.assert_not_called()
+
+        self.lock_mgt.terminate()
+        self.lock_mgt.coordinator.stop.assert_called_once_with()
+
+
+class CoordinatorTest(base.TestCase):
+
+    def setUp(self):
+        super(CoordinatorTest, self).setUp()
+        conf.CONF.set_override("backend_url", "memory://", "coordination")
+        self.addCleanup(conf.CONF.clear_override, "backend_url", "coordination")
+        conf.CONF.set_override("health_check_interval", 0, "coordination")
+        self.addCleanup(
+            conf.CONF.clear_override, "health_check_interval", "coordination"
+        )
+        self.m_get = mock.patch.object(
+            coordination, "get_coordinator", side_effect=lambda *a: mock.Mock()
+        ).start()
+        self.addCleanup(mock.patch.stopall)
+        self.coordinator = lock.Coordinator(agent_id="agent", prefix="test-")
+
+    def test_ensure_started_once(self):
+        self.coordinator.ensure_started()
+        self.coordinator.ensure_started()
+        self.assertEqual(1, self.m_get.call_count)
+        self.coordinator.coordinator.heartbeat.assert_called_once_with()
+
+    def test_ensure_started_reconnects(self):
+        self.coordinator.ensure_started()
+        self.coordinator.join_group("group")
+        broken = self.coordinator.coordinator
+        broken.heartbeat.side_effect = coordination.ToozConnectionError("lost")
+
+        self.coordinator.ensure_started()
+
+        self.assertEqual(2, self.m_get.call_count)
+        broken.stop.assert_called_once_with()
+        self.assertIsNot(broken, self.coordinator.coordinator)
+        self.coordinator.coordinator.join_group.assert_called_once_with(b"test-group")
+
+    def test_health_check_interval(self):
+        conf.CONF.set_override("health_check_interval", 3600, "coordination")
+        self.coordinator.ensure_started()
+        self.coordinator.ensure_started()
+        self.coordinator.coordinator.heartbeat.assert_not_called()
+
+
+class PartitionedGroupTest(base.TestCase):
+
+    def setUp(self):
+        super(PartitionedGroupTest, self).setUp()
+        path = self.useFixture(fixtures.TempDir()).path
+        conf.CONF.set_override("backend_url", f"file://{path}", "coordination")
+        self.addCleanup(conf.CONF.clear_override, "backend_url", "coordination")
+        self.members = [
+            lock.Coordinator(agent_id=f"agent{i}", prefix="test-") for i in range(2)
+        ]
+        for member in self.members:
+            member.start()
+            self.addCleanup(member.stop)
+
+    def test_not_joined(self):
+        self.assertTrue(self.members[0].belongs_to_self("group", "project"))
+
+    def test_partition_among_members(self):
+        projects = [f"project{i}" for i in range(20)]
+        for member in self.members:
+            member.join_partitioned_group("group")
+        for member in self.members:
+            member.run_watchers()
+
+        owned = [
+            {p for p in projects if member.belongs_to_self("group", p)}
+            for member in self.members
+        ]
+        self.assertEqual(set(projects), owned[0] | owned[1])
+        self.assertEqual(set(), owned[0] & owned[1])
+        self.assertTrue(owned[0] and owned[1])
+
+        # The remaining member takes over the projects of a leaving one
+        self.members[1].stop()
+        self.members[0].run_watchers()
+        self.assertTrue(
+            all(self.members[0].belongs_to_self("group", p) for p in projects)
+        )
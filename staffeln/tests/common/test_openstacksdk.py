@@ -74,9 +74,9 @@ class OpenstackSDKTest(base.TestCase):
 
     def test_get_servers(self):
         self.m_c.compute.servers = mock.MagicMock(return_value=[])
-        self.assertEqual(self.openstack.get_servers(), [])
+        self.assertEqual(list(self.openstack.get_servers()), [])
         self.m_c.compute.servers.assert_called_once_with(
-            details=True, all_projects=True
+            details=True, all_projects=True, limit=1000
         )
 
     def test_get_servers_non_http_error(self):
@@ -456,3 +456,155 @@ class OpenstackSDKTest(base.TestCase):
         )
         self.m_c.block_storage.get.assert_called_once_with("/os-quota-sets/bar")
         self.m_gam.assert_called_once_with("quota_set", m_j_r())
+
+
+class ConnectionCacheTest(base.TestCase):
+
+    def setUp(self):
+        super(ConnectionCacheTest, self).setUp()
+        self.cache = s_openstack.ConnectionCache()
+        conf.CONF.set_override("connection_cache_size", 2, "openstack")
+        self.addCleanup(conf.CONF.clear_override, "connection_cache_size", "openstack")
+
+    def _fake_conn(self, expire_soon=False):
+        conn = mock.MagicMock()
+        conn.session.auth.auth_ref.will_expire_soon.return_value = expire_soon
+        return conn
+
+    def test_get_reuses_connection(self):
+        conn = self._fake_conn()
+        connect = mock.Mock(return_value=conn)
+        self.assertEqual(conn, self.cache.get("foo", connect))
+        self.assertEqual(conn, self.cache.get("foo", connect))
+        connect.assert_called_once_with()
+
+    def test_get_evicts_least_recently_used(self):
+        conns = {name: self._fake_conn() for name in ("foo", "bar", "baz")}
+        self.cache.get("foo", lambda: conns["foo"])
+        self.cache.get("bar", lambda: conns["bar"])
+        self.cache.get("foo", mock.Mock())
+        self.cache.get("baz", lambda: conns["baz"])
+        self.assertNotIn("bar", self.cache)
+        self.assertIn("foo", self.cache)
+        self.assertEqual(2, len(self.cache))
+        conns["bar"].close.assert_called_once_with()
+        conns["foo"].close.assert_not_called()
+
+    def test_get_evicts_expiring_token(self):
+        old_conn = self._fake_conn(expire_soon=True)
+        new_conn = self._fake_conn()
+        self.cache.get("foo", lambda: old_conn)
+        self.assertEqual(new_conn, self.cache.get("foo", lambda: new_conn))
+        old_conn.close.assert_called_once_with()
+
+    def test_set_project_survives_refresh(self):
+        self.addCleanup(s_openstack.CONNECTIONS.clear)
+        m_c = mock.MagicMock()
+        m_c.connect_as_project.return_value = self._fake_conn()
+        with mock.patch("openstack.connect", return_value=m_c):
+            s_openstack.OpenstackSDK().set_project({"id": "foo", "name": "foo"})
+            s_openstack.OpenstackSDK().set_project({"id": "foo", "name": "foo"})
+        m_c.connect_as_project.assert_called_once_with({"id": "foo", "name": "foo"})
+
+    def test_refresh_keeps_project_scope(self):
+        self.addCleanup(s_openstack.CONNECTIONS.clear)
+        old_admin, new_admin = mock.MagicMock(), mock.MagicMock()
+        project_conn = self._fake_conn()
+        old_admin.connect_as_project.return_value = project_conn
+        with mock.patch("openstack.connect", side_effect=[old_admin, new_admin]):
+            sdk = s_openstack.OpenstackSDK()
+            sdk.set_project({"id": "foo", "name": "foo"})
+            sdk.refresh()
+        self.assertEqual(new_admin, sdk.admin_conn)
+        self.assertEqual(project_conn, sdk.conn)
+
+
+class IdentityCacheTest(base.TestCase):
+
+    def setUp(self):
+        super(IdentityCacheTest, self).setUp()
+        self.m_c = mock.MagicMock()
+        with mock.patch("openstack.connect", return_value=self.m_c):
+            self.openstack = s_openstack.OpenstackSDK()
+
+    def _fake_user(self, user_id, email):
+        return mock.MagicMock(id=user_id, email=email)
+
+    def test_get_project_member_emails_cached(self):
+        self.m_c.list_role_assignments.return_value = [
+            mock.MagicMock(user={"id": "foo"}),
+            mock.MagicMock(user="bar"),
+            mock.MagicMock(user={"id": "foo"}),
+        ]
+        users = {
+            "foo": self._fake_user("foo", "foo@example.com"),
+            "bar": self._fake_user("bar", None),
+        }
+        self.m_c.get_user.side_effect = lambda name_or_id: users[name_or_id]
+
+        for _ in range(2):
+            self.assertEqual(
+                ["foo@example.com"],
+                self.openstack.get_project_member_emails("project"),
+            )
+        self.m_c.list_role_assignments.assert_called_once_with(
+            filters={"project": "project"}
+        )
+        self.assertEqual(2, self.m_c.get_user.call_count)
+
+    def test_prefetch_user_emails(self):
+        self.m_c.identity.users.return_value = [
+            self._fake_user("foo", "foo@example.com"),
+            self._fake_user("bar", ""),
+        ]
+        self.m_c.list_role_assignments.return_value = [
+            mock.MagicMock(user="foo"),
+            mock.MagicMock(user="bar"),
+        ]
+        self.openstack.prefetch_user_emails()
+        self.assertEqual(
+            ["foo@example.com"],
+            self.openstack.get_project_member_emails("project"),
+        )
+        self.m_c.get_user.assert_not_called()
+
+
+class VolumeQuotaCacheTest(base.TestCase):
+
+    def setUp(self):
+        super(VolumeQuotaCacheTest, self).setUp()
+        self.m_c = mock.MagicMock()
+        with mock.patch("openstack.connect", return_value=self.m_c):
+            self.openstack = s_openstack.OpenstackSDK()
+        self.m_c._get_and_munchify.side_effect = lambda key, data: data
+
+    @mock.patch("openstack.proxy._json_response")
+    def test_get_volume_quotas_cached(self, m_j_r):
+        m_j_r.side_effect = lambda resp, error_message: {"backups": 1}
+        self.assertEqual({"backups": 1}, self.openstack._get_volume_quotas("bar"))
+        self.assertEqual({"backups": 1}, self.openstack._get_volume_quotas("bar"))
+        self.m_c.block_storage.get.assert_called_once_with(
+            "/os-quota-sets/bar?usage=True"
+        )
+
+    @mock.patch("openstack.proxy._json_response")
+    def test_get_quotas(self, m_j_r):
+        def fake_get(url):
+            if "fail" in url:
+                raise openstack_exc.HttpException(http_status=404)
+            return url
+
+        self.m_c.block_storage.get.side_effect = fake_get
+        m_j_r.side_effect = lambda resp, error_message: {"url": resp}
+        quotas = self.openstack.get_quotas(["foo", "bar", "fail", "foo"])
+        self.assertEqual(
+            {
+                "foo": {"url": "/os-quota-sets/foo?usage=True"},
+                "bar": {"url": "/os-quota-sets/bar?usage=True"},
+            },
+            quotas,
+        )
+        self.assertEqual(3, self.m_c.block_storage.get.call_count)
+        # Later lookups of the reports are served from the cache
+        self.openstack._get_volume_quotas("foo")
+        self.assertEqual(3, self.m_c.block_storage.get.call_count)
@@ -0,0 +1,147 @@
+# SPDX-License-Identifier: Apache-2.0
+from __future__ import annotations
+
+import copy
+import os
+from unittest import mock
+
+import fixtures
+
+from staffeln import conf
+from staffeln.common import lock, ratelimit
+from staffeln.tests import base
+
+
+class TokenBucketTest(base.TestCase):
+
+    @mock.patch("time.monotonic")
+    def test_consume(self, m_monotonic):
+        m_monotonic.return_value = 100.0
+        bucket = ratelimit.TokenBucket()
+        # The bucket starts full
+        self.assertEqual(0, bucket.consume(rate=2, burst=2))
+        self.assertEqual(0, bucket.consume(rate=2, burst=2))
+        self.assertEqual(0.5, bucket.consume(rate=2, burst=2))
+        m_monotonic.return_value = 100.5
+        self.assertEqual(0, bucket.consume(rate=2, burst=2))
+        # Tokens never exceed the burst
+        m_monotonic.return_value = 200.0
+        self.assertEqual(0, bucket.consume(rate=2, burst=2))
+        self.assertEqual(0, bucket.consume(rate=2, burst=2))
+        self.assertEqual(0.5, bucket.consume(rate=2, burst=2))
+
+    def test_consume_shared(self):
+        bucket = ratelimit.TokenBucket(shared=True)
+        self.assertEqual(0, bucket.consume(rate=1, burst=1))
+        self.assertGreater(bucket.consume(rate=1, burst=1), 0)
+
+
+class RateLimiterTest(base.TestCase):
+
+    def setUp(self):
+        super(RateLimiterTest, self).setUp()
+        self.limiter = ratelimit.RateLimiter()
+        conf.CONF.set_override("compute_rate_limit", 10, "openstack")
+        self.addCleanup(conf.CONF.clear_override, "compute_rate_limit", "openstack")
+
+    @mock.patch("time.sleep")
+    def test_acquire_unlimited(self, m_sleep):
+        self.limiter.local_buckets = {"identity": mock.Mock()}
+        self.limiter.acquire("identity")
+        self.limiter.local_buckets["identity"].consume.assert_not_called()
+
+    @mock.patch("time.sleep")
+    def test_acquire_waits(self, m_sleep):
+        bucket = mock.Mock()
+        bucket.consume.side_effect = [0.2, 0]
+        self.limiter.local_buckets["compute"] = bucket
+        self.limiter.acquire("compute")
+        bucket.consume.assert_called_with(10, 10)
+        m_sleep.assert_called_once_with(0.2)
+
+    def test_acquire_shared(self):
+        self.limiter.setup_shared()
+        self.limiter.shared_buckets["compute"] = mock.Mock()
+        self.limiter.shared_buckets["compute"].consume.return_value = 0
+        self.limiter.acquire("compute")
+        self.limiter.shared_buckets["compute"].consume.assert_called_once_with(10, 10)
+
+    @mock.patch.object(lock, "COORDINATOR")
+    def test_acquire_coordinated(self, m_coordinator):
+        conf.CONF.set_override("backend_url", "file:///tmp", "coordination")
+        self.addCleanup(conf.CONF.clear_override, "backend_url", "coordination")
+        m_coordinator.started = True
+        m_coordinator.get_members.return_value = {b"a", b"b", b"c", b"d"}
+        self.limiter.setup_shared()
+        self.limiter.local_buckets["compute"] = mock.Mock()
+        self.limiter.local_buckets["compute"].consume.return_value = 0
+        self.limiter.acquire("compute")
+        self.limiter.acquire("compute")
+        # The rate is shared by the group members
+        self.limiter.local_buckets["compute"].consume.assert_called_with(2.5, 2.5)
+        m_coordinator.join_group.assert_called_once_with(ratelimit.GROUP)
+        m_coordinator.get_members.assert_called_once_with(ratelimit.GROUP)
+
+    @mock.patch.object(ratelimit, "LIMITER")
+    def test_rate_limited(self, m_limiter):
+        @ratelimit.rate_limited("compute")
+        def func(arg):
+            return arg
+
+        self.assertEqual("foo", func("foo"))
+        m_limiter.acquire.assert_called_once_with("compute")
+
+    @mock.patch.object(ratelimit, "LIMITER")
+    def test_rate_limited_paginated(self, m_limiter):
+        conf.CONF.set_override("list_page_size", 2, "openstack")
+        self.addCleanup(conf.CONF.clear_override, "list_page_size", "openstack")
+
+        @ratelimit.rate_limited("compute", paginated=True)
+        def func():
+            return iter(range(5))
+
+        listing = func()
+        m_limiter.acquire.assert_not_called()
+        self.assertEqual([0, 1], [next(listing), next(listing)])
+        self.assertEqual(1, m_limiter.acquire.call_count)
+        self.assertEqual([2, 3, 4], list(listing))
+        # One request per page of 2 resources
+        self.assertEqual(3, m_limiter.acquire.call_count)
+
+
+class CoordinatedMembersTest(base.TestCase):
+
+    def setUp(self):
+        super(CoordinatedMembersTest, self).setUp()
+        path = self.useFixture(fixtures.TempDir()).path
+        conf.CONF.set_override("backend_url", f"file://{path}", "coordination")
+        self.addCleanup(conf.CONF.clear_override, "backend_url", "coordination")
+
+    def test_forked_processes_are_distinct_members(self):
+        parent = lock.Coordinator(prefix="test-")
+        # The copy stands for the coordinator inherited by a forked worker
+        child = copy.copy(parent)
+        child._after_fork()
+        self.assertNotEqual(parent.agent_id, child.agent_id)
+
+        for coordinator in (parent, child):
+            coordinator.start()
+            self.addCleanup(coordinator.stop)
+        limiter = ratelimit.RateLimiter()
+        with mock.patch.object(lock, "COORDINATOR", parent):
+            limiter._coordinated_members()
+        with mock.patch.object(lock, "COORDINATOR", child):
+            self.assertEqual(2, ratelimit.RateLimiter()._coordinated_members())
+
+    def test_after_fork_hook(self):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.write(write_fd, lock.COORDINATOR.agent_id.encode("ascii"))
+            os._exit(0)
+        os.close(write_fd)
+        os.waitpid(pid, 0)
+        with os.fdopen(read_fd) as pipe:
+            child_agent_id = pipe.read()
+        self.assertTrue(child_agent_id)
+        self.assertNotEqual(lock.COORDINATOR.agent_id, child_agent_id)
@@ -0,0 +1,525 @@
+# SPDX-License-Identifier: Apache-2.0
+from __future__ import annotations
+
+import collections
+import datetime
+import threading
+import time
+from unittest import mock
+
+from openstack import exceptions as openstack_exc
+from oslo_utils import timeutils
+
+from staffeln import conf
+from staffeln.common import constants, openstack
+from staffeln.conductor import backup, result
+from staffeln.tests import base
+
+
+class BackupTest(base.TestCase):
+
+    def setUp(self):
+        super(BackupTest, self).setUp()
+        self.m_c = mock.MagicMock()
+        openstack.CONNECTIONS.clear()
+        self.addCleanup(openstack.CONNECTIONS.clear)
+        with mock.patch("openstack.connect", return_value=self.m_c):
+            self.backup = backup.Backup()
+        self.backup.refresh_openstacksdk = mock.Mock()
+        self.m_history = mock.patch.object(
+            self.backup, "get_backup_history", return_value={}
+        ).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def _fake_volume(self, volume_id, status="in-use", name=None, size=1):
+        volume = mock.MagicMock(
+            id=volume_id, status=status, size=size, availability_zone="nova"
+        )
+        volume.name = name
+        return volume
+
+    def test_refresh_volume_index(self):
+        self.m_c.block_storage.volumes.return_value = [
+            self._fake_volume("vol1", name="foo", size=10),
+            self._fake_volume("vol2", status="error"),
+        ]
+        self.backup.refresh_volume_index()
+        self.m_c.block_storage.volumes.assert_called_once_with(
+            details=True, all_projects=True, limit=1000
+        )
+        self.assertEqual(
+            backup.VolumeMapping("vol1", "in-use", "foo", 10, "nova"),
+            self.backup.volume_index["vol1"],
+        )
+        self.assertEqual("error", self.backup.volume_index["vol2"].status)
+
+    def test_refresh_volume_index_failed(self):
+        self.m_c.block_storage.volumes.side_effect = openstack_exc.HttpException(
+            http_status=403
+        )
+        self.backup.volume_index = {"stale": None}
+        self.backup.refresh_volume_index()
+        self.assertEqual({}, self.backup.volume_index)
+
+    def test_filter_by_volume_status_from_index(self):
+        self.backup.volume_index = {
+            "vol1": backup.VolumeMapping("vol1", "available", None, 1, "nova"),
+            "vol2": backup.VolumeMapping("vol2", "error", None, 1, "nova"),
+        }
+        self.assertTrue(self.backup.filter_by_volume_status("vol1", "project"))
+        self.assertIn("error", self.backup.filter_by_volume_status("vol2", "project"))
+        self.m_c.get_volume_by_id.assert_not_called()
+
+    def test_filter_by_volume_status_index_miss(self):
+        self.m_c.get_volume_by_id.return_value = {
+            "status": "in-use",
+            "name": "foo",
+            "size": 1,
+        }
+        self.assertTrue(self.backup.filter_by_volume_status("vol1", "project"))
+        self.assertTrue(self.backup.filter_by_volume_status("vol1", "project"))
+        self.m_c.get_volume_by_id.assert_called_once_with("vol1")
+        self.assertIn("vol1", self.backup.volume_index)
+
+    def _fake_server(self, server_id, volume_ids):
+        server = mock.MagicMock(id=server_id, metadata={})
+        server.name = server_id
+        server.attached_volumes = [{"id": volume_id} for volume_id in volume_ids]
+        return server
+
+    def _fake_project(self, project_id):
+        project = mock.MagicMock(id=project_id)
+        project.name = project_id
+        return project
+
+    @mock.patch.object(backup.Backup, "_is_incremental", return_value=False)
+    @mock.patch.object(backup.Backup, "_is_backup_required", return_value=True)
+    def test_check_instance_volumes_workers(self, m_required, m_inc):
+        conf.CONF.set_override("discovery_workers", 4, "conductor")
+        self.addCleanup(conf.CONF.clear_override, "discovery_workers", "conductor")
+        projects = [self._fake_project(f"project{i}") for i in range(4)]
+        servers = {
+            "project0": [self._fake_server("server0", ["vol0", "vol1"])],
+            "project2": [self._fake_server("server2", ["vol2"])],
+            "project3": [self._fake_server("server3", ["vol3"])],
+        }
+
+        last_listed = threading.Event()
+
+        def fake_servers(details=True, all_projects=True, project_id=None, limit=None):
+            if project_id == "project0":
+                # The first project finishes after the others
+                last_listed.wait(5)
+            if project_id == "project3":
+                last_listed.set()
+            if project_id == "project1":
+                raise Exception("boom")
+            return servers.get(project_id, [])
+
+        self.m_c.list_projects.return_value = projects
+        self.m_c.compute.servers.side_effect = fake_servers
+        self.m_c.block_storage.volumes.return_value = [
+            self._fake_volume(f"vol{i}") for i in range(4)
+        ]
+        tasks = list(self.backup.check_instance_volumes())
+        # Candidates come in project order, whatever project finishes first
+        self.assertEqual(
+            ["vol0", "vol1", "vol2", "vol3"], [task.volume_id for task in tasks]
+        )
+        # Backup history is queried once per project with servers
+        self.assertEqual(3, self.m_history.call_count)
+
+    @mock.patch.object(backup.Backup, "_is_incremental", return_value=False)
+    @mock.patch.object(backup.Backup, "_is_backup_required", return_value=True)
+    def test_check_instance_volumes_all_projects_sweep(self, m_required, m_inc):
+        conf.CONF.set_override("discovery_all_projects_sweep", True, "conductor")
+        self.addCleanup(
+            conf.CONF.clear_override, "discovery_all_projects_sweep", "conductor"
+        )
+        server0 = self._fake_server("server0", ["vol0"])
+        server0.project_id = "project0"
+        server1 = self._fake_server("server1", ["vol1"])
+        server1.project_id = "project2"
+        self.m_c.list_projects.return_value = [
+            self._fake_project(f"project{i}") for i in range(3)
+        ]
+        self.m_c.compute.servers.return_value = [server1, server0]
+        self.m_c.block_storage.volumes.return_value = []
+        self.m_c.get_volume_by_id.return_value = {
+            "status": "in-use",
+            "name": None,
+            "size": 1,
+        }
+        tasks = list(self.backup.check_instance_volumes())
+        self.m_c.compute.servers.assert_called_once_with(
+            details=True, all_projects=True, limit=1000
+        )
+        self.assertEqual(
+            [("project0", "vol0"), ("project2", "vol1")],
+            [(task.project_id, task.volume_id) for task in tasks],
+        )
+
+    def test_update_project_list(self):
+        self.m_c.list_projects.return_value = [self._fake_project("project0")]
+        self.backup.update_project_list({"project0"})
+        self.backup.update_project_list({"project0"})
+        self.assertEqual(1, self.m_c.list_projects.call_count)
+        self.assertIn("project0", self.backup.project_list)
+
+        self.backup.update_project_list({"project1"})
+        self.assertEqual(2, self.m_c.list_projects.call_count)
+
+    def test_is_backup_required_with_history(self):
+        now = timeutils.utcnow()
+        history = {
+            "recent": {"last_created_at": now, "incremental": []},
+            "old": {
+                "last_created_at": now - datetime.timedelta(days=1),
+                "incremental": [],
+            },
+        }
+        self.assertFalse(self.backup._is_backup_required("recent", history))
+        self.assertTrue(self.backup._is_backup_required("old", history))
+        self.assertTrue(self.backup._is_backup_required("new", history))
+
+    def test_is_incremental_with_history(self):
+        history = {
+            "full": {"last_created_at": None, "incremental": [True, False]},
+            "chain": {"last_created_at": None, "incremental": [True, True]},
+        }
+        self.assertTrue(self.backup._is_incremental("full", history))
+        self.assertFalse(self.backup._is_incremental("chain", history))
+        self.assertFalse(self.backup._is_incremental("new", history))
+
+    def _queue_mapping(self, volume_id):
+        return backup.QueueMapping(
+            volume_id=volume_id,
+            backup_id="NULL",
+            project_id="project",
+            instance_id="server",
+            backup_status=0,
+            instance_name="server",
+            volume_name=volume_id,
+            incremental=False,
+            reason=None,
+            volume_size=1,
+            availability_zone="nova",
+        )
+
+    @mock.patch("staffeln.objects.Queue.create_bulk", return_value=2)
+    def test_create_queue(self, m_create_bulk):
+        old_task = mock.MagicMock(volume_id="vol0")
+        tasks = [self._queue_mapping(f"vol{i}") for i in range(3)]
+        with mock.patch.object(
+            self.backup, "check_instance_volumes", return_value=iter(tasks)
+        ):
+            self.backup.create_queue([old_task])
+        m_create_bulk.assert_called_once_with(context=self.backup.ctx, queues=mock.ANY)
+        queues = m_create_bulk.call_args[1]["queues"]
+        self.assertEqual(["vol1", "vol2"], [q["volume_id"] for q in queues])
+
+    @mock.patch("staffeln.objects.Queue.create_bulk", return_value=2)
+    def test_create_queue_streaming(self, m_create_bulk):
+        conf.CONF.set_override("queue_write_batch_size", 2, "conductor")
+        self.addCleanup(conf.CONF.clear_override, "queue_write_batch_size", "conductor")
+
+        def discover():
+            yield self._queue_mapping("vol0")
+            yield self._queue_mapping("vol1")
+            # The first batch is written before discovery goes on
+            self.assertEqual(1, m_create_bulk.call_count)
+            yield self._queue_mapping("vol2")
+
+        with mock.patch.object(
+            self.backup, "check_instance_volumes", return_value=discover()
+        ):
+            self.backup.create_queue([])
+        self.assertEqual(
+            [["vol0", "vol1"], ["vol2"]],
+            [
+                [q["volume_id"] for q in call[1]["queues"]]
+                for call in m_create_bulk.call_args_list
+            ],
+        )
+
+    def _fake_queue(self, volume_id, backup_id, project_id="project"):
+        return mock.MagicMock(
+            volume_id=volume_id,
+            backup_id=backup_id,
+            project_id=project_id,
+            volume_size=1,
+            incremental=False,
+        )
+
+    def test_list_creating_backups(self):
+        self.backup.project_list = {
+            "project": {"id": "project", "name": "project"},
+            "other": {"id": "other", "name": "other"},
+        }
+        queues = [
+            self._fake_queue("vol0", "backup0"),
+            self._fake_queue("vol1", "backup1"),
+            self._fake_queue("vol2", "backup2", project_id="other"),
+            self._fake_queue("vol3", "NULL", project_id="unknown"),
+        ]
+        self.m_c.connect_as_project.return_value = self.m_c
+        self.m_c.block_storage.backups.side_effect = [
+            [mock.MagicMock(id="backup0")],
+            [mock.MagicMock(id="backup2")],
+        ]
+        backups = self.backup.list_creating_backups(queues)
+        self.assertEqual({"backup0", "backup2"}, set(backups))
+        self.assertEqual(2, self.m_c.block_storage.backups.call_count)
+        self.m_c.block_storage.backups.assert_called_with(
+            details=True, all_projects=False, status="creating", limit=1000
+        )
+
+    def test_check_volume_backup_status_listed(self):
+        self.backup.project_list = {"project": {"id": "project", "name": "p"}}
+        queue = self._fake_queue("vol0", "backup0")
+        creating = {"backup0": mock.MagicMock(status="creating")}
+        self.backup.check_volume_backup_status(queue, creating)
+        self.m_c.get_volume_backup.assert_not_called()
+        # Only the next check time is updated
+        queue.save.assert_called_once_with()
+
+    @mock.patch.object(backup.Backup, "process_available_backup")
+    def test_check_volume_backup_status_not_listed(self, m_available):
+        self.backup.project_list = {"project": {"id": "project", "name": "p"}}
+        self.m_c.connect_as_project.return_value = self.m_c
+        self.m_c.get_volume_backup.return_value = mock.MagicMock(status="available")
+        queue = self._fake_queue("vol0", "backup0")
+        self.backup.check_volume_backup_status(queue, {})
+        self.m_c.get_volume_backup.assert_called_once_with("backup0")
+        m_available.assert_called_once_with(queue)
+
+    def test_schedule_next_check(self):
+        task = mock.MagicMock(volume_size=10, incremental=False)
+        now = timeutils.utcnow()
+        with mock.patch.object(timeutils, "utcnow", return_value=now):
+            # 10 GiB at the default 100 MiB/s
+            self.backup._schedule_next_check(task)
+            self.assertEqual(
+                now + datetime.timedelta(seconds=102.4), task.next_check_at
+            )
+            # Small volumes are checked after the minimum interval
+            task.volume_size = 0
+            self.backup._schedule_next_check(task)
+            self.assertEqual(now + datetime.timedelta(seconds=10), task.next_check_at)
+            # Overdue backups are checked less and less often
+            task.volume_size = 10
+            self.backup._schedule_next_check(task, elapsed=1000)
+            self.assertEqual(now + datetime.timedelta(seconds=250), task.next_check_at)
+            self.backup._schedule_next_check(task, elapsed=100000)
+            self.assertEqual(now + datetime.timedelta(seconds=600), task.next_check_at)
+
+    def test_observe_backup_throughput(self):
+        backup_gen = mock.MagicMock(
+            created_at="2024-01-01T00:00:00.000000",
+            updated_at="2024-01-01T00:00:10.000000",
+            size=10,
+            is_incremental=False,
+        )
+        self.backup._observe_backup_throughput(backup_gen)
+        self.assertEqual(0.8 * 100 + 0.2 * 1024, self.backup.backup_throughput[False])
+        self.assertEqual(100, self.backup.backup_throughput[True])
+
+    def test_schedule_next_check_notifications_enabled(self):
+        conf.CONF.set_override("backup_notifications_enabled", True, "conductor")
+        self.addCleanup(
+            conf.CONF.clear_override, "backup_notifications_enabled", "conductor"
+        )
+        task = mock.MagicMock(volume_size=10, incremental=False)
+        now = timeutils.utcnow()
+        with mock.patch.object(timeutils, "utcnow", return_value=now):
+            self.backup._schedule_next_check(task)
+        self.assertEqual(now + datetime.timedelta(seconds=600), task.next_check_at)
+
+    def test_dispatch_volume_backups_limits(self):
+        conf.CONF.set_override("backup_dispatch_workers", 4, "conductor")
+        conf.CONF.set_override("backup_dispatch_max_per_project", 2, "conductor")
+        conf.CONF.set_override("backup_dispatch_max_per_az", 3, "conductor")
+        for opt in (
+            "backup_dispatch_workers",
+            "backup_dispatch_max_per_project",
+            "backup_dispatch_max_per_az",
+        ):
+            self.addCleanup(conf.CONF.clear_override, opt, "conductor")
+        tasks = [
+            mock.MagicMock(
+                volume_id=f"vol{i}",
+                project_id=f"project{i % 2}",
+                availability_zone="az1" if i < 8 else "az2",
+            )
+            for i in range(12)
+        ]
+        lock = threading.Lock()
+        running = []
+        peaks = {"total": 0, "project": 0, "az": 0}
+
+        def fake_create(task):
+            with lock:
+                running.append(task)
+                peaks["total"] = max(peaks["total"], len(running))
+                projects = collections.Counter(t.project_id for t in running)
+                zones = collections.Counter(t.availability_zone for t in running)
+                peaks["project"] = max(peaks["project"], *projects.values())
+                peaks["az"] = max(peaks["az"], *zones.values())
+            time.sleep(0.01)
+            with lock:
+                running.remove(task)
+            if task.volume_id == "vol5":
+                raise Exception("boom")
+
+        with mock.patch.object(
+            self.backup, "create_volume_backup", side_effect=fake_create
+        ) as m_create:
+            self.backup.dispatch_volume_backups(tasks)
+        self.assertEqual(12, m_create.call_count)
+        self.assertLessEqual(peaks["total"], 4)
+        self.assertLessEqual(peaks["project"], 2)
+        self.assertLessEqual(peaks["az"], 3)
+        self.assertGreater(peaks["total"], 1)
+
+    def test_dispatch_volume_backups_sequential(self):
+        tasks = [mock.MagicMock(volume_id=f"vol{i}") for i in range(3)]
+        with mock.patch.object(self.backup, "create_volume_backup") as m_create:
+            self.backup.dispatch_volume_backups(iter(tasks))
+        self.assertEqual([mock.call(task) for task in tasks], m_create.call_args_list)
+
+    def test_list_creating_backups_admin_scope(self):
+        conf.CONF.set_override("admin_scope_backups", True, "openstack")
+        self.addCleanup(conf.CONF.clear_override, "admin_scope_backups", "openstack")
+        self.backup.project_list = {
+            "project": {"id": "project", "name": "project"},
+            "other": {"id": "other", "name": "other"},
+        }
+        queues = [
+            self._fake_queue("vol0", "backup0"),
+            self._fake_queue("vol1", "backup1", project_id="other"),
+        ]
+        self.m_c.block_storage.backups.return_value = [
+            mock.MagicMock(id="backup0"),
+            mock.MagicMock(id="backup1"),
+        ]
+        backups = self.backup.list_creating_backups(queues)
+        self.assertEqual({"backup0", "backup1"}, set(backups))
+        self.m_c.block_storage.backups.assert_called_once_with(
+            details=True, all_projects=True, status="creating", limit=1000
+        )
+        self.m_c.connect_as_project.assert_not_called()
+
+    @mock.patch.object(backup.Backup, "process_available_backup")
+    def test_check_volume_backup_status_admin_scope(self, m_available):
+        conf.CONF.set_override("admin_scope_backups", True, "openstack")
+        self.addCleanup(conf.CONF.clear_override, "admin_scope_backups", "openstack")
+        self.backup.project_list = {"project": {"id": "project", "name": "p"}}
+        self.m_c.block_storage.get_backup.return_value = mock.MagicMock(
+            status="available"
+        )
+        queue = self._fake_queue("vol0", "backup0")
+        self.backup.check_volume_backup_status(queue, {})
+        self.m_c.block_storage.get_backup.assert_called_once_with("backup0")
+        self.m_c.connect_as_project.assert_not_called()
+        m_available.assert_called_once_with(queue)
+
+    def test_prefetch_report_receivers(self):
+        conf.CONF.set_override("sender_email", "staffeln@example.com", "notification")
+        conf.CONF.set_override("member_email_prefetch_threshold", 2, "notification")
+        for opt in ("sender_email", "member_email_prefetch_threshold"):
+            self.addCleanup(conf.CONF.clear_override, opt, "notification")
+        self.backup.openstacksdk = mock.Mock()
+        self.backup.prefetch_report_receivers(1)
+        self.backup.openstacksdk.prefetch_user_emails.assert_not_called()
+
+        self.backup.prefetch_report_receivers(2)
+        self.backup.openstacksdk.prefetch_user_emails.assert_called_once_with()
+
+    @mock.patch.object(backup.Backup, "purge_backups")
+    @mock.patch("staffeln.conductor.result.BackupResult.publish", return_value=True)
+    def test_publish_backup_result(self, m_publish, m_purge):
+        self.backup.openstacksdk = mock.Mock()
+        self.backup.openstacksdk.get_projects.return_value = []
+        self.backup.project_list = {"project0": {"id": "project0", "name": "p0"}}
+        statuses = {
+            constants.BACKUP_COMPLETED: {"project0"},
+            constants.BACKUP_FAILED: {"project0", "deleted"},
+        }
+        with mock.patch.object(
+            self.backup, "get_queue_project_ids", side_effect=statuses.get
+        ):
+            self.backup.publish_backup_result(purge_on_success=True)
+        # Projects are reported from the queue, without a discovery run
+        m_publish.assert_called_once_with("project0", "p0")
+        self.assertEqual(
+            [mock.call("deleted"), mock.call("project0")], m_purge.call_args_list
+        )
+
+    def test_backup_result_initialized(self):
+        self.assertEqual("", result.BackupResult(self.backup).content)
+
+    @mock.patch("staffeln.objects.Volume.list_expired")
+    def test_get_expired_backups(self, m_list_expired):
+        conf.CONF.set_override("retention_page_size", 2, "conductor")
+        self.addCleanup(conf.CONF.clear_override, "retention_page_size", "conductor")
+        pages = [["b0", "b1"], ["b2", "b3"], ["b4"]]
+        m_list_expired.side_effect = pages
+        self.assertEqual(
+            ["b0", "b1", "b2", "b3", "b4"],
+            list(self.backup.get_expired_backups(default_cutoff="cutoff")),
+        )
+        self.assertEqual(3, m_list_expired.call_count)
+        m_list_expired.assert_called_with(
+            context=self.backup.ctx,
+            default_cutoff="cutoff",
+            instance_cutoffs=None,
+            limit=2,
+            marker="b3",
+        )
+
+    def _fake_backup_object(self, backup_id, project_id="project"):
+        return mock.MagicMock(backup_id=backup_id, project_id=project_id)
+
+    def test_request_backup_deletion(self):
+        self.backup.project_list = {"project": {"id": "project", "name": "p"}}
+        self.m_c.connect_as_project.return_value = self.m_c
+        self.m_c.get_volume_backup.return_value = {"status": "available"}
+        backup_object = self._fake_backup_object("backup0")
+        self.assertEqual(
+            constants.DELETION_IN_PROGRESS,
+            self.backup.request_backup_deletion(backup_object),
+        )
+        self.m_c.delete_volume_backup.assert_called_once_with("backup0", force=False)
+        self.assertIsNotNone(backup_object.deletion_requested_at)
+        backup_object.save.assert_called_once_with()
+
+        self.assertEqual(
+            constants.DELETION_FAILED,
+            self.backup.request_backup_deletion(
+                self._fake_backup_object("backup1", project_id="unknown")
+            ),
+        )
+
+    def test_check_backup_deletion(self):
+        self.backup.project_list = {"project": {"id": "project", "name": "p"}}
+        self.m_c.connect_as_project.return_value = self.m_c
+        backup_object = self._fake_backup_object("backup0")
+
+        self.m_c.get_volume_backup.return_value = {"status": "deleting"}
+        self.assertEqual(
+            constants.DELETION_IN_PROGRESS,
+            self.backup.check_backup_deletion(backup_object),
+        )
+        self.m_c.get_volume_backup.return_value = None
+        self.assertEqual(
+            constants.DELETION_DONE,
+            self.backup.check_backup_deletion(backup_object),
+        )
+        backup_object.delete_backup.assert_called_once_with()
+
+        self.m_c.get_volume_backup.return_value = {"status": "error_deleting"}
+        self.assertEqual(
+            constants.DELETION_FAILED,
+            self.backup.check_backup_deletion(backup_object),
+        )
+        self.assertIsNone(backup_object.deletion_requested_at)
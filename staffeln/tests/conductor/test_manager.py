@@ -0,0 +1,228 @@
+# SPDX-License-Identifier: Apache-2.0
+from __future__ import annotations
+
+import datetime
+from unittest import mock
+
+import tooz
+from oslo_utils import timeutils
+
+from staffeln import conf
+from staffeln.common import constants
+from staffeln.conductor import manager
+from staffeln.tests import base
+
+
+class BackupManagerTest(base.TestCase):
+
+    def setUp(self):
+        super(BackupManagerTest, self).setUp()
+        with mock.patch.object(manager.backup_controller, "Backup"):
+            self.manager = manager.BackupManager(0, conf.CONF)
+        self.controller = self.manager.controller
+        self.manager.lock_mgt = mock.MagicMock()
+        coordinator = self.manager.lock_mgt.coordinator
+        coordinator.get_lock.return_value.acquire.return_value = True
+
+    def _queue(self, volume_id, started_ago, next_check_in=None, created_ago=None):
+        now = timeutils.utcnow()
+        return mock.MagicMock(
+            volume_id=volume_id,
+            backup_status=constants.BACKUP_WIP,
+            started_at=now - datetime.timedelta(seconds=started_ago),
+            created_at=now - datetime.timedelta(seconds=created_ago or started_ago),
+            next_check_at=(
+                None
+                if next_check_in is None
+                else now + datetime.timedelta(seconds=next_check_in)
+            ),
+        )
+
+    def test_process_wip_tasks_single_pass(self):
+        conf.CONF.set_override("backup_cycle_timout", "10min", "conductor")
+        self.addCleanup(conf.CONF.clear_override, "backup_cycle_timout", "conductor")
+        expired = self._queue("vol0", started_ago=3600)
+        due = self._queue("vol1", started_ago=60)
+        not_due = self._queue("vol2", started_ago=60, next_check_in=300)
+        self.controller.get_queues.return_value = [expired, due, not_due]
+
+        self.manager._process_wip_tasks()
+
+        # The projects are loaded even if this worker never discovered
+        self.controller.update_project_list.assert_called_once_with(
+            {expired.project_id, due.project_id, not_due.project_id}
+        )
+        self.controller.hard_cancel_backup_task.assert_called_once_with(expired)
+        self.controller.list_creating_backups.assert_called_once_with([due])
+        self.controller.check_volume_backup_status.assert_called_once_with(
+            due, self.controller.list_creating_backups.return_value
+        )
+
+    def test_process_wip_tasks_timeout_from_start(self):
+        conf.CONF.set_override("backup_cycle_timout", "10min", "conductor")
+        self.addCleanup(conf.CONF.clear_override, "backup_cycle_timout", "conductor")
+        # Queued long ago, but only claimed recently
+        queue = self._queue("vol0", started_ago=60, created_ago=3600)
+        legacy = self._queue("vol1", started_ago=0, created_ago=3600)
+        legacy.started_at = None
+        self.controller.get_queues.return_value = [queue, legacy]
+
+        self.manager._process_wip_tasks()
+
+        self.controller.hard_cancel_backup_task.assert_called_once_with(legacy)
+        self.controller.list_creating_backups.assert_called_once_with([queue])
+
+    def test_process_wip_tasks_empty(self):
+        self.controller.get_queues.return_value = []
+        self.manager._process_wip_tasks()
+        self.controller.list_creating_backups.assert_not_called()
+
+    def test_process_wip_tasks_partitioned(self):
+        self.manager.partitioned = True
+        coordinator = self.manager.lock_mgt.coordinator
+        coordinator.belongs_to_self.side_effect = (
+            lambda group, project_id: project_id == "mine"
+        )
+        mine = self._queue("vol0", started_ago=60)
+        mine.project_id = "mine"
+        other = self._queue("vol1", started_ago=60)
+        other.project_id = "other"
+        self.controller.get_queues.return_value = [mine, other]
+
+        self.manager._process_wip_tasks()
+
+        coordinator.run_watchers.assert_called_once_with()
+        # Only the projects of the own partition are loaded
+        self.controller.update_project_list.assert_called_once_with({"mine"})
+        self.controller.list_creating_backups.assert_called_once_with([mine])
+
+    def test_join_backup_workers(self):
+        coordinator = self.manager.lock_mgt.coordinator
+        coordinator.supports_partitioning = True
+        self.manager._join_backup_workers()
+        coordinator.join_partitioned_group.assert_called_once_with(
+            constants.BACKUP_WORKERS
+        )
+        self.assertTrue(self.manager.partitioned)
+
+    def test_join_backup_workers_unsupported(self):
+        coordinator = self.manager.lock_mgt.coordinator
+        coordinator.supports_partitioning = False
+        self.manager._join_backup_workers()
+        coordinator.join_partitioned_group.assert_not_called()
+        self.assertFalse(self.manager.partitioned)
+
+        coordinator.supports_partitioning = True
+        coordinator.join_partitioned_group.side_effect = tooz.NotImplemented
+        self.manager._join_backup_workers()
+        self.assertFalse(self.manager.partitioned)
+
+    def test_join_backup_workers_failure(self):
+        coordinator = self.manager.lock_mgt.coordinator
+        coordinator.supports_partitioning = True
+        coordinator.join_partitioned_group.side_effect = tooz.ToozError("down")
+        self.assertRaises(tooz.ToozError, self.manager._join_backup_workers)
+
+    def test_claim_todo_tasks_partitioned(self):
+        self.manager.partitioned = True
+        coordinator = self.manager.lock_mgt.coordinator
+        coordinator.belongs_to_self.side_effect = (
+            lambda group, project_id: project_id == "mine"
+        )
+        self.controller.get_queue_project_ids.return_value = {"mine", "other"}
+        task = mock.MagicMock(project_id="mine")
+        self.controller.claim_queue_tasks.side_effect = [[task], []]
+
+        self.assertEqual([task], list(self.manager._claim_todo_tasks()))
+        self.controller.update_project_list.assert_called_once_with({"mine"})
+        self.controller.claim_queue_tasks.assert_called_with(
+            constants.BACKUP_PLANNED,
+            limit=conf.CONF.conductor.task_claim_batch_size,
+            worker_id=self.manager.worker_name,
+            project_ids=["mine"],
+        )
+
+    def test_claim_todo_tasks_nothing_owned(self):
+        self.manager.partitioned = True
+        self.manager.lock_mgt.coordinator.belongs_to_self.return_value = False
+        self.controller.get_queue_project_ids.return_value = {"other"}
+        self.assertEqual([], list(self.manager._claim_todo_tasks()))
+        self.controller.claim_queue_tasks.assert_not_called()
+
+    def test_update_task_queue_keeps_claimed_tasks(self):
+        planned = mock.MagicMock(backup_status=constants.BACKUP_PLANNED)
+        claimed = mock.MagicMock(backup_status=constants.BACKUP_INIT)
+        wip = mock.MagicMock(backup_status=constants.BACKUP_WIP)
+        queues = {task.backup_status: [task] for task in (planned, claimed, wip)}
+        self.controller.get_queues.side_effect = lambda filters: queues[
+            filters["backup_status"]
+        ]
+
+        self.manager._update_task_queue()
+
+        # A task claimed by a dispatching worker is not queued again
+        self.controller.create_queue.assert_called_once_with([planned, claimed, wip])
+
+
+class RotationManagerTest(base.TestCase):
+
+    def setUp(self):
+        super(RotationManagerTest, self).setUp()
+        with mock.patch.object(manager.backup_controller, "Backup"):
+            self.manager = manager.RotationManager(0, conf.CONF)
+        self.controller = self.manager.controller
+        self.manager.threshold_strtime = None
+        self.manager.instance_retention_map = {}
+        conf.CONF.set_override("retention_page_size", 2, "conductor")
+        self.addCleanup(conf.CONF.clear_override, "retention_page_size", "conductor")
+
+    def _backup(self, backup_id, instance_id, created_ago):
+        return mock.MagicMock(
+            id=backup_id,
+            backup_id=backup_id,
+            volume_id=f"vol-{instance_id}",
+            instance_id=instance_id,
+            created_at=timeutils.utcnow() - datetime.timedelta(days=created_ago),
+        )
+
+    @mock.patch.object(manager.retention_planner, "DeletionPipeline")
+    def test_rotate_backups_per_batch(self, m_pipeline):
+        in_flight = self._backup("b2", "b", 1)
+        expired = [
+            self._backup("a2", "a", 1),
+            self._backup("a1", "a", 2),
+            self._backup("b1", "b", 2),
+            in_flight,
+        ]
+        self.controller.get_backups.return_value = [in_flight]
+        self.controller.get_expired_backups.return_value = iter(expired)
+        self.controller.get_volumes_backups.return_value = []
+        m_pipeline.return_value.run.return_value = 1
+
+        removed = self.manager._rotate_backups(mock.MagicMock(), timeout=60)
+
+        self.assertEqual(2, removed)
+        # The history is loaded for the volumes of one batch at a time
+        self.assertEqual(
+            [mock.call({"vol-a"}), mock.call({"vol-b"})],
+            self.controller.get_volumes_backups.call_args_list,
+        )
+        runs = m_pipeline.return_value.run.call_args_list
+        self.assertEqual(2, len(runs))
+        self.assertEqual(expired[:2], runs[0].args[0])
+        self.assertEqual([in_flight], runs[0].kwargs["in_flight"])
+        # Deletions already requested are not requested again
+        self.assertEqual([expired[2]], runs[1].args[0])
+        self.assertEqual([], runs[1].kwargs["in_flight"])
+
+    @mock.patch.object(manager.retention_planner, "DeletionPipeline")
+    def test_rotate_backups_in_flight_only(self, m_pipeline):
+        in_flight = self._backup("b1", "b", 1)
+        self.controller.get_backups.return_value = [in_flight]
+        self.controller.get_expired_backups.return_value = iter([])
+        m_pipeline.return_value.run.return_value = 1
+
+        self.assertEqual(1, self.manager._rotate_backups(mock.MagicMock(), 60))
+        m_pipeline.return_value.run.assert_called_once_with(
+            [], {}, in_flight=[in_flight], timeout=mock.ANY
+        )
@@ -0,0 +1,160 @@
+# SPDX-License-Identifier: Apache-2.0
+from __future__ import annotations
+
+import threading
+from unittest import mock
+
+import oslo_messaging
+from oslo_messaging import conffixture
+
+from staffeln import conf
+from staffeln.common import constants
+from staffeln.conductor import notification
+from staffeln.tests import base
+
+
+class BackupNotificationEndpointTest(base.TestCase):
+
+    def setUp(self):
+        super(BackupNotificationEndpointTest, self).setUp()
+        self.controller = mock.MagicMock(project_list={"project": mock.Mock()})
+        self.lock_mgt = mock.MagicMock()
+        self.lock_mgt.coordinator.get_lock.return_value.acquire.return_value = True
+        self.endpoint = notification.BackupNotificationEndpoint(
+            self.controller, self.lock_mgt
+        )
+        self.task = mock.MagicMock(
+            id=1,
+            volume_id="vol0",
+            project_id="project",
+            backup_status=constants.BACKUP_WIP,
+        )
+        self.controller.get_queue_task_by_backup_id.return_value = self.task
+        self.controller.get_queue_task_by_id.return_value = self.task
+
+    def test_filter_rule(self):
+        rule = self.endpoint.filter_rule
+        self.assertTrue(rule.match(None, None, "backup.create.end", None, None))
+        self.assertTrue(rule.match(None, None, "backup.create.error", None, None))
+        self.assertFalse(rule.match(None, None, "backup.create.start", None, None))
+        self.assertFalse(rule.match(None, None, "backup.delete.end", None, None))
+
+    def test_backup_available(self):
+        result = self.endpoint.info(
+            {},
+            "backup.host",
+            "backup.create.end",
+            {"backup_id": "backup0", "status": "available"},
+            {},
+        )
+        self.assertEqual(oslo_messaging.NotificationResult.HANDLED, result)
+        self.controller.get_queue_task_by_backup_id.assert_called_once_with("backup0")
+        self.controller.process_available_backup.assert_called_once_with(self.task)
+        self.controller.process_failed_backup.assert_not_called()
+
+    def test_backup_error(self):
+        self.endpoint.error(
+            {},
+            "backup.host",
+            "backup.create.error",
+            {"backup_id": "backup0", "status": "error"},
+            {},
+        )
+        self.controller.set_backup_scope.assert_called_once_with("project")
+        self.controller.process_failed_backup.assert_called_once_with(self.task)
+
+    def test_unknown_backup(self):
+        self.controller.get_queue_task_by_backup_id.return_value = None
+        self.endpoint.info(
+            {},
+            "backup.host",
+            "backup.create.end",
+            {"backup_id": "other", "status": "available"},
+            {},
+        )
+        self.lock_mgt.coordinator.get_lock.assert_not_called()
+        self.controller.process_available_backup.assert_not_called()
+
+    def test_task_already_processed(self):
+        self.task.backup_status = constants.BACKUP_COMPLETED
+        self.endpoint.info(
+            {},
+            "backup.host",
+            "backup.create.end",
+            {"backup_id": "backup0", "status": "available"},
+            {},
+        )
+        self.controller.process_available_backup.assert_not_called()
+
+    def test_task_locked(self):
+        self.lock_mgt.coordinator.get_lock.return_value.acquire.return_value = False
+        result = self.endpoint.info(
+            {},
+            "backup.host",
+            "backup.create.end",
+            {"backup_id": "backup0", "status": "available"},
+            {},
+        )
+        # Delivered again once the task is released
+        self.assertEqual(oslo_messaging.NotificationResult.REQUEUE, result)
+        self.controller.get_queue_task_by_id.assert_not_called()
+        self.controller.process_available_backup.assert_not_called()
+
+
+class BackupNotificationListenerTest(base.TestCase):
+
+    def setUp(self):
+        super(BackupNotificationListenerTest, self).setUp()
+        messaging_conf = self.useFixture(conffixture.ConfFixture(conf.CONF))
+        messaging_conf.transport_url = "fake:/"
+        self.controller = mock.MagicMock(project_list={})
+        self.lock_mgt = mock.MagicMock()
+        self.task = mock.MagicMock(
+            id=1, volume_id="vol0", backup_status=constants.BACKUP_WIP
+        )
+        self.controller.get_queue_task_by_backup_id.return_value = self.task
+        self.controller.get_queue_task_by_id.return_value = self.task
+        self.processed = threading.Event()
+        self.controller.process_available_backup.side_effect = (
+            lambda task: self.processed.set()
+        )
+
+    def _notify(self, event_type, payload):
+        endpoint = notification.BackupNotificationEndpoint(
+            self.controller, self.lock_mgt
+        )
+        listener = notification.get_backup_notification_listener(conf.CONF, endpoint)
+        listener.start()
+        self.addCleanup(listener.wait)
+        self.addCleanup(listener.stop)
+        transport = oslo_messaging.get_notification_transport(conf.CONF)
+        notifier = oslo_messaging.Notifier(
+            transport,
+            publisher_id="backup.host",
+            driver="messaging",
+            topics=conf.CONF.conductor.backup_notification_topics,
+        )
+        notifier.info({}, event_type, payload)
+
+    def test_backup_create_end(self):
+        acquire = self.lock_mgt.coordinator.get_lock.return_value.acquire
+        acquire.return_value = True
+        self._notify(
+            "backup.create.end", {"backup_id": "backup0", "status": "available"}
+        )
+
+        self.assertTrue(self.processed.wait(10))
+        self.controller.get_queue_task_by_backup_id.assert_called_with("backup0")
+        self.controller.process_available_backup.assert_called_once_with(self.task)
+
+    def test_backup_create_end_requeued(self):
+        # The task is held by a backup worker on the first delivery
+        acquire = self.lock_mgt.coordinator.get_lock.return_value.acquire
+        acquire.side_effect = [False, True]
+        self._notify(
+            "backup.create.end", {"backup_id": "backup0", "status": "available"}
+        )
+
+        self.assertTrue(self.processed.wait(10))
+        self.assertEqual(2, acquire.call_count)
+        self.controller.process_available_backup.assert_called_once_with(self.task)
@@ -0,0 +1,201 @@
+# SPDX-License-Identifier: Apache-2.0
+from __future__ import annotations
+
+import datetime
+from unittest import mock
+
+from staffeln import conf
+from staffeln.common import constants
+from staffeln.conductor import retention
+from staffeln.tests import base
+
+
+class RetentionPolicyTest(base.TestCase):
+
+    def setUp(self):
+        super(RetentionPolicyTest, self).setUp()
+        self.now = datetime.datetime(2024, 1, 15)
+
+    def test_policy(self):
+        policy = retention.RetentionPolicy("1w2d", now=self.now)
+        self.assertTrue(policy.valid)
+        self.assertEqual(datetime.datetime(2024, 1, 6), policy.cutoff)
+
+    def test_invalid_policy(self):
+        policy = retention.RetentionPolicy("forever", now=self.now)
+        self.assertFalse(policy.valid)
+        self.assertIsNone(policy.cutoff)
+
+    @mock.patch.object(
+        retention.xtime,
+        "parse_timedelta_string",
+        wraps=retention.xtime.parse_timedelta_string,
+    )
+    def test_policies_get_cutoffs(self, m_parse):
+        policies = retention.RetentionPolicies(now=self.now)
+        cutoffs = policies.get_cutoffs(
+            {"a": "1d", "b": "1d", "c": "2d", "d": "invalid", "e": "1d"}
+        )
+        self.assertEqual(
+            {
+                "a": datetime.datetime(2024, 1, 14),
+                "b": datetime.datetime(2024, 1, 14),
+                "c": datetime.datetime(2024, 1, 13),
+                "e": datetime.datetime(2024, 1, 14),
+            },
+            cutoffs,
+        )
+        # Each distinct retention time is parsed once
+        self.assertEqual(3, m_parse.call_count)
+
+
+class PlanDeletionsTest(base.TestCase):
+
+    def setUp(self):
+        super(PlanDeletionsTest, self).setUp()
+        self.now = datetime.datetime(2024, 1, 1)
+        self.count = 0
+
+    def _backup(self, volume_id, incremental, completed=1):
+        self.count += 1
+        return mock.Mock(
+            id=self.count,
+            backup_id=f"{volume_id}-{self.count}",
+            volume_id=volume_id,
+            incremental=incremental,
+            backup_completed=completed,
+            created_at=self.now + datetime.timedelta(hours=self.count),
+        )
+
+    def test_build_dependents(self):
+        full = self._backup("vol1", False)
+        inc1 = self._backup("vol1", True)
+        failed = self._backup("vol1", True, completed=0)
+        inc2 = self._backup("vol1", True)
+        full2 = self._backup("vol1", False)
+        other = self._backup("vol2", True)
+
+        dependents = retention.build_dependents(
+            [inc2, other, full2, failed, inc1, full]
+        )
+        self.assertEqual(
+            {full.backup_id: [inc1], inc1.backup_id: [inc2]}, dict(dependents)
+        )
+        self.assertNotIn(full2.backup_id, dependents)
+
+    def test_plan_deletions(self):
+        full = self._backup("vol1", False)
+        inc1 = self._backup("vol1", True)
+        inc2 = self._backup("vol1", True)
+        full2 = self._backup("vol1", False)
+        inc3 = self._backup("vol1", True)
+        kept = self._backup("vol1", True)
+        backups = [full, inc1, inc2, full2, inc3, kept]
+
+        deletions, skipped = retention.plan_deletions(
+            [full, inc1, inc2, full2, inc3], retention.build_dependents(backups)
+        )
+        # Dependents are deleted before the backups they depend on
+        self.assertEqual([inc2, inc1, full], deletions)
+        # The chain of a backup not expired yet is kept
+        self.assertEqual([inc3, full2], skipped)
+
+    def test_plan_deletions_failed_backup(self):
+        full = self._backup("vol1", False)
+        failed = self._backup("vol1", True, completed=0)
+        inc = self._backup("vol1", True)
+
+        deletions, skipped = retention.plan_deletions(
+            [full, failed], retention.build_dependents([full, failed, inc])
+        )
+        self.assertEqual([failed], deletions)
+        self.assertEqual([full], skipped)
+
+    def test_batch_expired_backups(self):
+        backups = [mock.Mock(instance_id=instance_id) for instance_id in "aabbbcd"]
+        batches = list(retention.batch_expired_backups(iter(backups), 2))
+        # Batches are only closed between two instances
+        self.assertEqual([backups[:2], backups[2:5], backups[5:]], batches)
+        self.assertEqual([], list(retention.batch_expired_backups(iter([]), 2)))
+
+
+class DeletionPipelineTest(base.TestCase):
+
+    def setUp(self):
+        super(DeletionPipelineTest, self).setUp()
+        conf.CONF.set_override("deletion_rate", 0, "conductor")
+        self.addCleanup(conf.CONF.clear_override, "deletion_rate", "conductor")
+        self.m_sleep = mock.patch("time.sleep").start()
+        self.addCleanup(mock.patch.stopall)
+        self.controller = mock.Mock()
+        self.checks = {}
+        self.controller.request_backup_deletion.side_effect = self._request
+        self.controller.check_backup_deletion.side_effect = self._check
+        self.events = []
+
+    def _backup(self, backup_id):
+        return mock.Mock(backup_id=backup_id)
+
+    def _request(self, backup):
+        self.events.append(("request", backup.backup_id))
+        if backup.backup_id == "fail":
+            return constants.DELETION_FAILED
+        return constants.DELETION_IN_PROGRESS
+
+    def _check(self, backup):
+        # Cinder removes a backup at the second check
+        self.checks[backup.backup_id] = self.checks.get(backup.backup_id, 0) + 1
+        if self.checks[backup.backup_id] < 2:
+            return constants.DELETION_IN_PROGRESS
+        self.events.append(("gone", backup.backup_id))
+        return constants.DELETION_DONE
+
+    def test_run_chain(self):
+        full, inc1, inc2 = (self._backup(name) for name in ("full", "inc1", "inc2"))
+        other = self._backup("other")
+        dependents = {"full": [inc1], "inc1": [inc2]}
+
+        pipeline = retention.DeletionPipeline(self.controller)
+        removed = pipeline.run([inc2, other, inc1, full], dependents)
+
+        self.assertEqual(4, removed)
+        # A backup is only requested once its dependents are gone
+        for child, parent in (("inc2", "inc1"), ("inc1", "full")):
+            self.assertLess(
+                self.events.index(("gone", child)),
+                self.events.index(("request", parent)),
+            )
+
+    def test_run_window(self):
+        conf.CONF.set_override("deletion_window", 2, "conductor")
+        self.addCleanup(conf.CONF.clear_override, "deletion_window", "conductor")
+        backups = [self._backup(f"b{i}") for i in range(5)]
+        pipeline = retention.DeletionPipeline(self.controller)
+        self.assertEqual(5, pipeline.run(backups, {}))
+        # The first round only requests the window
+        self.assertEqual(
+            [("request", "b0"), ("request", "b1"), ("gone", "b0"), ("gone", "b1")],
+            self.events[:4],
+        )
+
+    def test_run_failed_blocks_parent(self):
+        full, failed = self._backup("full"), self._backup("fail")
+        pipeline = retention.DeletionPipeline(self.controller)
+        removed = pipeline.run([failed, full], {"full": [failed]})
+        self.assertEqual(0, removed)
+        self.assertNotIn(("request", "full"), self.events)
+
+    def test_run_in_flight_timeout(self):
+        in_flight = self._backup("in-flight")
+        pipeline = retention.DeletionPipeline(self.controller)
+        removed = pipeline.run([], {}, in_flight=[in_flight], timeout=0)
+        self.assertEqual(0, removed)
+        self.controller.check_backup_deletion.assert_not_called()
+
+    def test_run_in_flight(self):
+        full, inc = self._backup("full"), self._backup("inc")
+        pipeline = retention.DeletionPipeline(self.controller)
+        removed = pipeline.run([inc, full], {"full": [inc]}, in_flight=[inc])
+        self.assertEqual(2, removed)
+        # The deletion requested by a previous run is only checked
+        self.assertNotIn(("request", "inc"), self.events)
@@ -0,0 +1,249 @@
+# SPDX-License-Identifier: Apache-2.0
+from __future__ import annotations
+
+import datetime
+from unittest import mock
+
+from sqlalchemy import orm
+
+from staffeln import conf
+from staffeln.db.sqlalchemy import api as sqla_api
+from staffeln.db.sqlalchemy import models
+from staffeln.tests import base
+
+
+class DbApiTest(base.TestCase):
+
+    def setUp(self):
+        super(DbApiTest, self).setUp()
+        conf.CONF.set_override("connection", "sqlite://", "database")
+        self.addCleanup(conf.CONF.clear_override, "connection", "database")
+        sqla_api._FACADE = None
+        self.addCleanup(setattr, sqla_api, "_FACADE", None)
+        models.Base.metadata.create_all(sqla_api.get_engine())
+        self.dbapi = sqla_api.Connection()
+        self.now = datetime.datetime(2024, 1, 1)
+
+    def _create_backup(self, volume_id, incremental=False, hours_ago=0, **kwargs):
+        values = {
+            "volume_id": volume_id,
+            "project_id": "project",
+            "instance_id": "instance",
+            "backup_completed": 1,
+            "incremental": incremental,
+            "created_at": self.now - datetime.timedelta(hours=hours_ago),
+        }
+        values.update(kwargs)
+        return self.dbapi.create_backup(values)
+
+    def test_get_backup_history(self):
+        self._create_backup("vol1", incremental=False, hours_ago=3)
+        self._create_backup("vol1", incremental=True, hours_ago=2)
+        self._create_backup("vol1", incremental=True, hours_ago=1)
+        self._create_backup("vol2", incremental=False, hours_ago=5)
+
+        history = self.dbapi.get_backup_history(["vol1", "vol2", "vol3"], depth=2)
+
+        self.assertEqual({"vol1", "vol2"}, set(history))
+        self.assertEqual(
+            self.now - datetime.timedelta(hours=1),
+            history["vol1"]["last_created_at"],
+        )
+        self.assertEqual([True, True], history["vol1"]["incremental"])
+        self.assertEqual([False], history["vol2"]["incremental"])
+
+    def test_get_backup_history_no_depth(self):
+        self._create_backup("vol1", hours_ago=1)
+        history = self.dbapi.get_backup_history(["vol1"])
+        self.assertEqual([], history["vol1"]["incremental"])
+
+    def _queue_values(self, volume_id, **kwargs):
+        values = {
+            "backup_id": "NULL",
+            "volume_id": volume_id,
+            "project_id": "project",
+            "instance_id": "instance",
+            "backup_status": 0,
+            "instance_name": "instance",
+            "volume_name": volume_id,
+            "incremental": False,
+            "reason": None,
+        }
+        values.update(kwargs)
+        return values
+
+    def test_create_queue_bulk(self):
+        count = sqla_api.MAX_BULK_INSERT_SIZE * 2 + 1
+        values_list = [self._queue_values(f"vol{i}") for i in range(count)]
+
+        self.assertEqual(count, self.dbapi.create_queue_bulk(values_list))
+
+        queues = self.dbapi.get_queue_list(None)
+        self.assertEqual(count, len(queues))
+        self.assertEqual(
+            {f"vol{i}" for i in range(count)}, {q.volume_id for q in queues}
+        )
+        self.assertTrue(all(q.created_at is not None for q in queues))
+        self.assertTrue(all(q.backup_id == "NULL" for q in queues))
+
+    def test_create_queue_bulk_empty(self):
+        self.assertEqual(0, self.dbapi.create_queue_bulk([]))
+
+    def test_purge_queues(self):
+        self.dbapi.create_queue_bulk(
+            [
+                self._queue_values("vol0", backup_status=0),
+                self._queue_values("vol1", backup_status=1),
+                self._queue_values("vol2", backup_status=2),
+                self._queue_values("vol3", backup_status=3),
+                self._queue_values("vol4", backup_status=2, project_id="other"),
+            ]
+        )
+
+        self.assertEqual(2, self.dbapi.purge_queues("project", [2, 3]))
+
+        self.assertEqual(
+            ["vol0", "vol1", "vol4"],
+            sorted(q.volume_id for q in self.dbapi.get_queue_list(None)),
+        )
+
+    def test_claim_tasks(self):
+        self.dbapi.create_queue_bulk(
+            [self._queue_values(f"vol{i}", backup_status=0) for i in range(3)]
+            + [self._queue_values("vol3", backup_status=1)]
+        )
+
+        claimed = self.dbapi.claim_tasks(0, 2, "worker-a")
+        self.assertEqual(["vol0", "vol1"], [q.volume_id for q in claimed])
+        self.assertTrue(all(q.backup_status == 4 for q in claimed))
+        self.assertTrue(all(q.claimed_by == "worker-a" for q in claimed))
+        self.assertTrue(all(q.started_at is not None for q in claimed))
+
+        claimed = self.dbapi.claim_tasks(0, 2, "worker-b")
+        self.assertEqual(["vol2"], [q.volume_id for q in claimed])
+        self.assertEqual([], self.dbapi.claim_tasks(0, 2, "worker-a"))
+
+        statuses = {
+            q.volume_id: q.backup_status for q in self.dbapi.get_queue_list(None)
+        }
+        self.assertEqual({"vol0": 4, "vol1": 4, "vol2": 4, "vol3": 1}, statuses)
+
+    def test_claim_tasks_lost_race(self):
+        self.dbapi.create_queue_bulk(
+            [self._queue_values(f"vol{i}", backup_status=0) for i in range(3)]
+        )
+        update = orm.Query.update
+
+        def racing_update(query, values, **kwargs):
+            if m_update.call_count == 1:
+                # Another worker claims the candidates first
+                update(
+                    query,
+                    {
+                        models.Queue_data.backup_status: 4,
+                        models.Queue_data.claimed_by: "worker-b",
+                    },
+                    **kwargs,
+                )
+            return update(query, values, **kwargs)
+
+        with mock.patch.object(
+            orm.Query, "update", autospec=True, side_effect=racing_update
+        ) as m_update:
+            claimed = self.dbapi.claim_tasks(0, 2, "worker-a")
+        self.assertEqual(["vol2"], [q.volume_id for q in claimed])
+        self.assertEqual(2, m_update.call_count)
+
+    def test_claim_tasks_of_projects(self):
+        self.dbapi.create_queue_bulk(
+            [
+                self._queue_values("vol0", project_id="project0"),
+                self._queue_values("vol1", project_id="project1"),
+                self._queue_values("vol2", project_id="project2"),
+                self._queue_values("vol3", project_id="project2", backup_status=1),
+            ]
+        )
+        self.assertEqual(
+            {"project0", "project1", "project2"},
+            self.dbapi.get_queue_project_ids(0),
+        )
+
+        claimed = self.dbapi.claim_tasks(
+            0, 10, "worker-a", project_ids=["project0", "project2"]
+        )
+        self.assertEqual(["vol0", "vol2"], [q.volume_id for q in claimed])
+        self.assertEqual({"project1"}, self.dbapi.get_queue_project_ids(0))
+
+    def test_get_queue_by_backup_id(self):
+        self.dbapi.create_queue_bulk(
+            [
+                self._queue_values("vol0", backup_id="backup0"),
+                self._queue_values("vol1", backup_id="backup1"),
+            ]
+        )
+        self.assertEqual(
+            "vol1", self.dbapi.get_queue_by_backup_id(None, "backup1").volume_id
+        )
+
+    def test_get_expired_backup_list(self):
+        self._create_backup("vol1", instance_id="default", hours_ago=30)
+        self._create_backup("vol1", instance_id="default", hours_ago=20)
+        self._create_backup("vol1", instance_id="default", hours_ago=1)
+        self._create_backup("vol2", instance_id="custom", hours_ago=5)
+        self._create_backup("vol2", instance_id="custom", hours_ago=3)
+        self._create_backup("vol2", instance_id="custom", hours_ago=1)
+
+        backups = self.dbapi.get_expired_backup_list(
+            default_cutoff=self.now - datetime.timedelta(hours=10),
+            instance_cutoffs={"custom": self.now - datetime.timedelta(hours=2)},
+        )
+        self.assertEqual(
+            [("custom", 3), ("custom", 5), ("default", 20), ("default", 30)],
+            [
+                (b.instance_id, (self.now - b.created_at).total_seconds() // 3600)
+                for b in backups
+            ],
+        )
+
+    def test_get_expired_backup_list_paginated(self):
+        for hours_ago in range(10, 15):
+            self._create_backup("vol1", hours_ago=hours_ago)
+        cutoff = self.now - datetime.timedelta(hours=1)
+
+        first = self.dbapi.get_expired_backup_list(default_cutoff=cutoff, limit=3)
+        second = self.dbapi.get_expired_backup_list(
+            default_cutoff=cutoff, limit=3, marker=first[-1]
+        )
+        self.assertEqual(3, len(first))
+        self.assertEqual(2, len(second))
+        created = [b.created_at for b in first + second]
+        self.assertEqual(sorted(created, reverse=True), created)
+
+    def test_get_expired_backup_list_no_cutoff(self):
+        self._create_backup("vol1", hours_ago=10)
+        self.assertEqual([], self.dbapi.get_expired_backup_list())
+
+    def test_get_volumes_backup_list(self):
+        self._create_backup("vol2", hours_ago=1)
+        self._create_backup("vol1", hours_ago=1)
+        self._create_backup("vol1", hours_ago=2)
+        self._create_backup("vol3", hours_ago=1)
+
+        backups = self.dbapi.get_volumes_backup_list(["vol1", "vol2"])
+        self.assertEqual(
+            [("vol1", 2), ("vol1", 1), ("vol2", 1)],
+            [
+                (b.volume_id, (self.now - b.created_at).total_seconds() // 3600)
+                for b in backups
+            ],
+        )
+
+    def test_get_backup_list_deletion_requested(self):
+        self._create_backup("vol1")
+        backup = self._create_backup("vol2")
+        self.dbapi.update_backup(backup.id, {"deletion_requested_at": self.now})
+
+        backups = self.dbapi.get_backup_list(
+            None, filters={"deletion_requested_at__neq": None}
+        )
+        self.assertEqual(["vol2"], [b.volume_id for b in backups])